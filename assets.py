@@ -0,0 +1,97 @@
+import os
+import gzip
+import hashlib
+import mimetypes
+from typing import Dict, Optional
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional: gzip alone still covers every browser
+    brotli = None
+
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS = 256  # bytes; smaller files are not worth a Content-Encoding
+HTML_CACHE = "no-cache"  # pages change on deploy: always revalidate, usually a 304
+ASSET_CACHE = "public, max-age=86400"
+
+
+class Asset:
+    __slots__ = ("media_type", "cache_control", "variants")
+
+    def __init__(self, media_type: str, cache_control: str, variants: Dict[str, tuple]):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.variants = variants  # content-encoding ("identity", "gzip", "br") -> (body, etag)
+
+
+class StaticAssets:
+    """Every file under `directory`, read and compressed once at startup.
+
+    A request only picks a variant from Accept-Encoding and compares ETags,
+    so a join burst costs no disk reads and no compression. Each variant has
+    its own strong ETag; a matching If-None-Match gets an empty 304.
+    """
+
+    def __init__(self, directory: str):
+        self.assets: Dict[str, Asset] = {}
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, directory).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    self.assets[rel] = _load(rel, f.read())
+
+    def get(self, path: str) -> Optional[Asset]:
+        """Looks `path` up the way StaticFiles(html=True) does: "" and "dir/" mean their index.html."""
+        path = path.lstrip("/")
+        if path == "" or path.endswith("/"):
+            path += "index.html"
+        return self.assets.get(path) or self.assets.get(path + "/index.html")
+
+    def response(self, request: Request, path: str) -> Response:
+        asset = self.get(path)
+        if asset is None:
+            return Response("Not Found", status_code=404, media_type="text/plain")
+        encoding = _choose(request.headers.get("accept-encoding", ""), asset.variants)
+        body, etag = asset.variants[encoding]
+        headers = {"ETag": etag, "Cache-Control": asset.cache_control, "Vary": "Accept-Encoding"}
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        tags = _etags(request.headers.get("if-none-match", ""))
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+        return Response(body if request.method != "HEAD" else b"", media_type=asset.media_type,
+                        headers=dict(headers, **{"Content-Length": str(len(body))}))
+
+
+def _load(path: str, body: bytes) -> Asset:
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if media_type.startswith("text/"):
+        media_type += "; charset=utf-8"
+    digest = hashlib.sha256(body).hexdigest()[:20]
+    variants = {"identity": (body, f'"{digest}"')}
+    if media_type.startswith(COMPRESSIBLE) and len(body) >= MIN_COMPRESS:
+        variants["gzip"] = (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gz"')
+        if brotli is not None:
+            variants["br"] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+    cache = HTML_CACHE if path.endswith(".html") else ASSET_CACHE
+    return Asset(media_type, cache, variants)
+
+
+def _choose(accept: str, variants: Dict[str, tuple]) -> str:
+    accepted = set()
+    for part in accept.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.strip().lower())
+    for encoding in ("br", "gzip"):
+        if encoding in variants and (encoding in accepted or "*" in accepted):
+            return encoding
+    return "identity"
+
+
+def _etags(header: str) -> set:
+    # If-None-Match compares weakly, so W/"x" matches "x"
+    return {tag.strip().removeprefix("W/") for tag in header.split(",")} if header else set()
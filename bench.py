@@ -0,0 +1,508 @@
+"""Load generator and latency benchmark for main.py (/ws) and server.py (Socket.IO).
+
+    python bench.py main --profile join_storm --clients 2000
+    python bench.py server --profile steady --clients 500 --rounds 5
+    python bench.py main --profile slow_consumers --compare bench_results/main-slow_consumers.json
+
+The app under test runs in its own uvicorn subprocess (so the load generator's
+own CPU use does not show up as server latency). Each run writes a JSON result
+to bench_results/<target>-<profile>.json; --compare checks it against an
+earlier result and exits non-zero on a regression.
+
+Fan-out latency is per round: from the server emitting a question/result
+(timestamped inside the server process, keyed by the broadcast's event_seq)
+to the last non-slow client receiving it. Both sides read CLOCK_MONOTONIC
+(time.monotonic), which is shared by every process on the host.
+
+Needs the packages in requirements-bench.txt.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(ROOT, "bench_results")
+LAG_INTERVAL = 0.01
+PROFILES = ("join_storm", "steady", "slow_consumers")
+
+# metrics where bigger is better; every other numeric metric regresses upwards
+HIGHER_IS_BETTER = {"join_throughput"}
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(q / 100 * (len(values) - 1)))))
+    return values[idx]
+
+
+def summarize(values, scale=1000.0):
+    # seconds in, milliseconds out
+    if not values:
+        return {"p50": None, "p99": None, "max": None, "n": 0}
+    return {
+        "p50": round(percentile(values, 50) * scale, 3),
+        "p99": round(percentile(values, 99) * scale, 3),
+        "max": round(max(values) * scale, 3),
+        "n": len(values),
+    }
+
+
+def rss_kib(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def fanout(received, emits):
+    # per round: last receive of that broadcast minus its server-side emit
+    return [last - emits[str(seq)] for seq, last in received.items() if str(seq) in emits]
+
+
+# --- server side: runs inside the subprocess ---
+
+def instrument(target, module, emits):
+    """Records when each room broadcast leaves the app, keyed by its event_seq."""
+    if target == "main":
+        original = module.GameRoom.broadcast_frames
+
+        async def broadcast_frames(room, build):
+            emits[room.events.seq + 1] = time.monotonic()
+            await original(room, build)
+
+        module.GameRoom.broadcast_frames = broadcast_frames
+    else:
+        original = module.room_emit
+
+        async def room_emit(event, data, meeting_id):
+            start = time.monotonic()
+            await original(event, data, meeting_id)
+            emits[data["event_seq"]] = start
+
+        module.room_emit = room_emit
+
+
+def serve(target, port, stats_path):
+    import uvicorn
+
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    module = __import__(target)
+    lags = []
+    emits = {}
+    instrument(target, module, emits)
+
+    async def lag_probe():
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LAG_INTERVAL)
+            lags.append(max(0.0, loop.time() - start - LAG_INTERVAL))
+
+    async def run():
+        server = uvicorn.Server(uvicorn.Config(module.app, host="127.0.0.1", port=port, log_level="warning", ws_max_queue=256))
+        probe = asyncio.create_task(lag_probe())
+        await server.serve()
+        probe.cancel()
+        with open(stats_path, "w") as f:
+            json.dump({"event_loop_lag_ms": summarize(lags), "emits": emits}, f)
+
+    asyncio.run(run())
+
+
+class ServerProcess:
+    def __init__(self, target, port):
+        self.target = target
+        self.port = port
+        self.stats_path = tempfile.mktemp(suffix=".json")
+        self.proc = None
+
+    async def __aenter__(self):
+        self.proc = subprocess.Popen([sys.executable, __file__, "_serve", self.target, str(self.port), self.stats_path], cwd=ROOT)
+        deadline = time.monotonic() + 15
+        while time.monotonic() < deadline:
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", self.port)
+                writer.close()
+                return self
+            except OSError:
+                await asyncio.sleep(0.1)
+        raise RuntimeError(f"{self.target} did not start on port {self.port}")
+
+    async def __aexit__(self, *exc):
+        self.proc.send_signal(signal.SIGINT)
+        try:
+            self.proc.wait(15)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+    def rss(self):
+        return rss_kib(self.proc.pid)
+
+    def stats(self):
+        try:
+            with open(self.stats_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+        finally:
+            if os.path.exists(self.stats_path):
+                os.unlink(self.stats_path)
+
+
+# --- main.py /ws players ---
+
+class WsPlayer:
+    def __init__(self, bench, name, slow_delay=0.0):
+        self.bench = bench
+        self.name = name
+        self.slow_delay = slow_delay
+        self.ws = None
+        self.joined = asyncio.Event()
+        self.closed = False
+
+    async def connect(self, base):
+        import websockets
+        self.ws = await websockets.connect(f"{base}/ws/bench/{self.name}", max_queue=1 if self.slow_delay else 16, open_timeout=60)
+        asyncio.create_task(self.read())
+
+    async def read(self):
+        try:
+            async for raw in self.ws:
+                now = time.monotonic()
+                msg = json.loads(raw)
+                kind = msg.get("type")
+                if kind == "participants":
+                    self.joined.set()
+                elif kind == "question":
+                    self.bench.on_question(self, msg, now)
+                elif kind in ("correct", "wrong"):
+                    self.bench.on_result(self, msg, now)
+                if self.slow_delay:
+                    await asyncio.sleep(self.slow_delay)
+        except Exception:
+            pass
+        self.closed = True
+
+    async def answer(self):
+        await self.ws.send(json.dumps({"type": "answer", "answer": random.randrange(4)}))
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+
+class WsBench:
+    def __init__(self, args, base):
+        self.args = args
+        self.base = base
+        self.players = []
+        self.answerer = None
+        self.question_event = asyncio.Event()
+        self.received = {"question": {}, "result": {}}  # kind -> event_seq -> last receive
+        self.result_seen = 0
+        self.expected = 0
+        self.result_done = asyncio.Event()
+
+    def record(self, kind, player, msg, now):
+        if not player.slow_delay:
+            seen = self.received[kind]
+            seen[msg["event_seq"]] = max(now, seen.get(msg["event_seq"], now))
+
+    def on_question(self, player, msg, now):
+        self.record("question", player, msg, now)
+        # only the assigned answerer's copy matters: it is the one that will answer
+        if msg["answerer"] == player.name:
+            self.answerer = player
+            self.question_event.set()
+
+    def on_result(self, player, msg, now):
+        self.record("result", player, msg, now)
+        if player.slow_delay or self.result_done.is_set():
+            return
+        self.result_seen += 1
+        if self.result_seen >= self.expected:
+            self.result_done.set()
+
+    async def join(self, n, slow=0):
+        players = [WsPlayer(self, f"u{i}", self.args.slow_delay if i < slow else 0.0) for i in range(n)]
+        sem = asyncio.Semaphore(self.args.concurrency)
+
+        async def one(p):
+            async with sem:
+                await p.connect(self.base)
+            await p.joined.wait()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(p) for p in players))
+        self.players = players
+        return time.perf_counter() - start
+
+    async def rounds(self, count):
+        # main.py has no round timeout, so each round is driven by answering as soon as the question lands
+        for _ in range(count):
+            try:
+                await asyncio.wait_for(self.question_event.wait(), self.args.round_timeout)
+            except asyncio.TimeoutError:
+                break
+            self.question_event.clear()
+            player, self.answerer = self.answerer, None
+            self.result_seen = 0
+            self.expected = sum(1 for p in self.players if not p.closed and not p.slow_delay)
+            self.result_done.clear()
+            await player.answer()
+            try:
+                await asyncio.wait_for(self.result_done.wait(), self.args.round_timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self):
+        await asyncio.gather(*(p.close() for p in self.players), return_exceptions=True)
+
+    def dropped(self):
+        return sum(1 for p in self.players if p.closed)
+
+
+# --- server.py Socket.IO players ---
+
+class SioPlayer:
+    def __init__(self, bench, name, moderator=False, slow_delay=0.0):
+        import socketio
+        self.bench = bench
+        self.name = name
+        self.moderator = moderator
+        self.slow_delay = slow_delay
+        self.pid = None
+        self.joined = asyncio.Event()
+        self.client = socketio.AsyncClient(reconnection=False)
+        self.client.on("joined", self.on_joined)
+        self.client.on("participants_snapshot", self.on_snapshot)
+        self.client.on("start_round", self.on_start_round)
+        self.client.on("round_result", self.on_round_result)
+
+    async def on_joined(self, data):
+        self.pid = data["participant_id"]
+
+    async def on_snapshot(self, data):
+        self.joined.set()
+
+    async def on_start_round(self, data):
+        self.bench.on_start_round(self, data, time.monotonic())
+        if self.slow_delay:
+            await asyncio.sleep(self.slow_delay)
+
+    async def on_round_result(self, data):
+        self.bench.on_round_result(self, data, time.monotonic())
+        if self.slow_delay:
+            await asyncio.sleep(self.slow_delay)
+
+    async def connect(self, base):
+        await self.client.connect(base, transports=["websocket"], wait_timeout=60)
+        await self.client.emit("join", {"meeting_id": "bench", "name": self.name, "is_moderator": self.moderator})
+
+    async def close(self):
+        await self.client.disconnect()
+
+
+class SioBench:
+    def __init__(self, args, base):
+        self.args = args
+        self.base = base
+        self.players = []
+        self.moderator = None
+        self.received = {"question": {}, "result": {}}  # kind -> event_seq -> last receive
+        self.seen = 0
+        self.done = asyncio.Event()
+
+    def record(self, kind, player, data, now):
+        if not player.slow_delay:
+            seen = self.received[kind]
+            seen[data["event_seq"]] = max(now, seen.get(data["event_seq"], now))
+
+    def on_start_round(self, player, data, now):
+        self.record("question", player, data, now)
+        if player.pid == data["assigned_pid"]:
+            asyncio.create_task(player.client.emit("answer", {"round_id": data["round_id"], "selected_index": 0}))
+
+    def on_round_result(self, player, data, now):
+        self.record("result", player, data, now)
+        if player.slow_delay:
+            return
+        self.seen += 1
+        if self.seen >= self.expected:
+            self.done.set()
+
+    async def join(self, n, slow=0):
+        import aiohttp
+        async with aiohttp.ClientSession() as session:
+            await session.post(f"{self.base}/meetings/bench/questions",
+                               json={"text": "2+2?", "choices": ["4", "5"], "correct_index": 0})
+        self.moderator = SioPlayer(self, "moderator", moderator=True)
+        await self.moderator.connect(self.base)
+        await self.moderator.joined.wait()
+        players = [SioPlayer(self, f"u{i}", slow_delay=self.args.slow_delay if i < slow else 0.0) for i in range(n)]
+        sem = asyncio.Semaphore(self.args.concurrency)
+
+        async def one(p):
+            async with sem:
+                await p.connect(self.base)
+            await p.joined.wait()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(p) for p in players))
+        self.players = players
+        return time.perf_counter() - start
+
+    async def rounds(self, count):
+        self.expected = sum(1 for p in self.players if not p.slow_delay) + 1
+        for _ in range(count):
+            self.seen = 0
+            self.done.clear()
+            await self.moderator.client.emit("start_round", {"meeting_id": "bench"})
+            try:
+                await asyncio.wait_for(self.done.wait(), self.args.round_timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self):
+        await asyncio.gather(*(p.close() for p in self.players + [self.moderator]), return_exceptions=True)
+
+    def dropped(self):
+        return sum(1 for p in self.players if not p.client.connected)
+
+
+# --- driver ---
+
+async def run_profile(args):
+    bench_cls = WsBench if args.target == "main" else SioBench
+    async with ServerProcess(args.target, args.port) as server:
+        base = f"{'ws' if args.target == 'main' else 'http'}://127.0.0.1:{args.port}"
+        bench = bench_cls(args, base)
+        rss_before = server.rss()
+        slow = int(args.clients * args.slow_fraction) if args.profile == "slow_consumers" else 0
+        join_seconds = await bench.join(args.clients, slow)
+        await asyncio.sleep(0.5)  # let coalesced presence deltas settle before sampling memory
+        rss_after = server.rss()
+        result = {
+            "join_seconds": round(join_seconds, 3),
+            "join_throughput": round(args.clients / join_seconds, 1) if join_seconds else None,
+            "memory_per_client_kib": round((rss_after - rss_before) / max(1, args.clients), 2),
+        }
+        if args.profile != "join_storm":
+            await bench.rounds(args.rounds)
+            result["slow_clients"] = slow
+            result["dropped_clients"] = bench.dropped()
+        await bench.close()
+    stats = server.stats()
+    emits = stats.pop("emits", {})
+    if args.profile != "join_storm":
+        # p50/p99/max over rounds of emit -> last receive
+        result["question_fanout_ms"] = summarize(fanout(bench.received["question"], emits))
+        result["result_fanout_ms"] = summarize(fanout(bench.received["result"], emits))
+    result.update(stats)
+    return result
+
+
+def flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            flatten(f"{prefix}.{k}" if prefix else k, v, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = value
+    return out
+
+
+def compare(current, baseline, tolerance):
+    """Returns the metrics that got worse than baseline by more than tolerance."""
+    now = flatten("", current["metrics"], {})
+    then = flatten("", baseline["metrics"], {})
+    regressions = []
+    for key, old in then.items():
+        new = now.get(key)
+        if new is None or not old or key.endswith(".n") or key in ("slow_clients",):
+            continue
+        higher_better = key.split(".")[0] in HIGHER_IS_BETTER
+        change = (old - new) / old if higher_better else (new - old) / old
+        if change > tolerance:
+            regressions.append((key, old, new, change))
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == "_serve":
+        raise_fd_limit()
+        serve(argv[1], int(argv[2]), argv[3])
+        return 0
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("target", choices=("main", "server"))
+    parser.add_argument("--profile", choices=PROFILES, default="steady")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=200, help="connects in flight at once")
+    parser.add_argument("--slow-fraction", type=float, default=0.1, help="share of slow clients in slow_consumers")
+    parser.add_argument("--slow-delay", type=float, default=0.25, help="seconds a slow client sleeps per message")
+    parser.add_argument("--round-timeout", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--out", help="result file (default bench_results/<target>-<profile>.json)")
+    parser.add_argument("--compare", help="baseline result file to check against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    raise_fd_limit()
+    metrics = asyncio.run(run_profile(args))
+    report = {
+        "target": args.target,
+        "profile": args.profile,
+        "params": {"clients": args.clients, "rounds": args.rounds, "concurrency": args.concurrency,
+                   "slow_fraction": args.slow_fraction, "slow_delay": args.slow_delay},
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "metrics": metrics,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{args.target}-{args.profile}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for key, old, new, change in regressions:
+            print(f"REGRESSION {key}: {old} -> {new} ({change:+.0%})")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
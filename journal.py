@@ -0,0 +1,148 @@
+import os
+import json
+import glob
+import queue
+import asyncio
+import threading
+from typing import Callable, List, Optional, Tuple
+
+SNAPSHOT_INTERVAL = 30.0  # seconds between compact snapshots
+_ROTATE = object()
+_STOP = object()
+
+
+class Journal:
+    """Append-only event log with write-behind and periodic snapshots.
+
+    append() only numbers the event and puts it on a queue; a writer thread
+    drains whatever has accumulated, writes it in one go and fsyncs once per
+    batch (group commit). Snapshots are serialized and written on an executor
+    thread; after one lands, log segments it covers are deleted.
+
+    Layout in `directory`:
+        snapshot.json        {"seq": N, "state": {...}}
+        events-<seq>.log     one JSON event per line, seq > the segment's start
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.seq = 0
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- loop side ---
+
+    def append(self, event: dict):
+        self.seq += 1
+        event["seq"] = self.seq
+        self._queue.put(event)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._writer, name="journal-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    async def snapshot(self, export: Callable[[], dict]):
+        # export() runs on the loop and must only build plain containers;
+        # encoding and disk I/O happen on an executor thread
+        state, seq = export(), self.seq
+        self._queue.put((_ROTATE, seq))
+        await asyncio.get_running_loop().run_in_executor(None, self._write_snapshot, state, seq)
+
+    async def run_snapshots(self, export: Callable[[], dict], interval: float = SNAPSHOT_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            await self.snapshot(export)
+
+    # --- recovery (call before start) ---
+
+    def recover(self) -> Tuple[Optional[dict], List[dict]]:
+        """Returns (snapshot state or None, events newer than the snapshot, in order)."""
+        state, upto = None, 0
+        path = os.path.join(self.directory, "snapshot.json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                snap = json.load(f)
+            state, upto = snap["state"], snap["seq"]
+        events = []
+        for segment in self._segments():
+            with open(segment, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        break  # torn write at the tail of a crashed segment
+                    if event["seq"] > upto:
+                        events.append(event)
+        self.seq = max([upto] + [e["seq"] for e in events])
+        return state, events
+
+    # --- writer thread ---
+
+    def _segments(self) -> List[str]:
+        paths = glob.glob(os.path.join(self.directory, "events-*.log"))
+        return sorted(paths, key=_segment_start)
+
+    def _open_segment(self, start: int):
+        return open(os.path.join(self.directory, f"events-{start}.log"), "a", encoding="utf-8")
+
+    def _writer(self):
+        out = self._open_segment(self.seq)
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while True:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            lines = []
+            for item in batch:
+                if item is _STOP or isinstance(item, tuple) and item[0] is _ROTATE:
+                    if lines:
+                        out.write("".join(lines))
+                        lines = []
+                    out.flush()
+                    os.fsync(out.fileno())
+                    if item is _STOP:
+                        out.close()
+                        return
+                    # snapshot taken at seq N: later events start a new segment
+                    out.close()
+                    out = self._open_segment(item[1])
+                    continue
+                lines.append(json.dumps(item, ensure_ascii=False) + "\n")
+            if lines:
+                out.write("".join(lines))
+                out.flush()
+                os.fsync(out.fileno())
+
+    def _write_snapshot(self, state: dict, seq: int):
+        path = os.path.join(self.directory, "snapshot.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"seq": seq, "state": state}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        # the rotate marker went in ahead of every event after seq, so segments that
+        # start before seq hold nothing newer than the snapshot (the writer may still
+        # be finishing one; on POSIX it keeps writing into the unlinked file)
+        for segment in self._segments():
+            if _segment_start(segment) < seq:
+                os.remove(segment)
+
+
+def _segment_start(path: str) -> int:
+    return int(os.path.basename(path)[len("events-"):-len(".log")])
+
+
+def open_journal() -> Optional[Journal]:
+    """Journaling is on when QUIZ_JOURNAL_DIR is set."""
+    directory = os.environ.get("QUIZ_JOURNAL_DIR")
+    return Journal(directory) if directory else None
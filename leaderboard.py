@@ -0,0 +1,74 @@
+import itertools
+from typing import Dict, List, Optional, Tuple
+from sortedcontainers import SortedList
+
+LEADERBOARD_TOP = 10  # entries in the top-N snapshot attached to deltas
+
+
+class Leaderboard:
+    """Scores kept ordered by (score desc, join order): O(log n) updates, O(k) top-k.
+
+    Ranks are 1-based.
+    """
+
+    def __init__(self):
+        self._order = SortedList()  # (-score, join_seq, key)
+        self._entries: Dict[str, Tuple[int, int, str]] = {}  # key -> (score, join_seq, name)
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def add(self, key: str, name: Optional[str] = None, score: int = 0) -> int:
+        if key not in self._entries:
+            seq = next(self._seq)
+            self._entries[key] = (score, seq, name if name is not None else key)
+            self._order.add((-score, seq, key))
+        return self.rank(key)
+
+    def remove(self, key: str) -> Optional[int]:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        score, seq, _ = entry
+        self._order.remove((-score, seq, key))
+        return score
+
+    def score(self, key: str) -> int:
+        return self._entries[key][0]
+
+    def rank(self, key: str) -> int:
+        score, seq, _ = self._entries[key]
+        return self._order.index((-score, seq, key)) + 1
+
+    def add_score(self, key: str, points: int) -> Tuple[int, int, int]:
+        """Returns (new score, old rank, new rank)."""
+        score, seq, name = self._entries[key]
+        old_rank = self._order.index((-score, seq, key)) + 1
+        if not points:
+            return score, old_rank, old_rank
+        self._order.remove((-score, seq, key))
+        score += points
+        self._entries[key] = (score, seq, name)
+        self._order.add((-score, seq, key))
+        return score, old_rank, self._order.index((-score, seq, key)) + 1
+
+    def top(self, k: int = LEADERBOARD_TOP) -> List[dict]:
+        return [{"id": key, "name": self._entries[key][2], "score": -neg, "rank": i + 1}
+                for i, (neg, _, key) in enumerate(self._order.islice(0, k))]
+
+    def scores(self) -> Dict[str, int]:
+        return {key: -neg for neg, _, key in self._order}
+
+    def reset(self):
+        for key, (_, seq, name) in list(self._entries.items()):
+            self._entries[key] = (0, seq, name)
+        self._order = SortedList((0, seq, key) for key, (_, seq, _) in self._entries.items())
+
+
+def rank_change(key: str, name: str, score: int, old_rank: int, new_rank: int) -> dict:
+    # clients shift everyone between new_rank and old_rank down by one
+    return {"id": key, "name": name, "score": score, "from": old_rank, "to": new_rank}
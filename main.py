@@ -1,22 +1,88 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
-import random
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
+import secrets
 import asyncio
 import json
-from typing import List
-
-app = FastAPI()
-
-
-app.mount("/static", StaticFiles(directory="static"), name="static")
-
-with open("static/index.html", "r", encoding="utf-8") as f:
-    html_content = f.read()
-
-@app.get("/")
-async def get():
-    return HTMLResponse(html_content)
+import re
+import sys
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+from leaderboard import Leaderboard, LEADERBOARD_TOP, rank_change
+from presence import PresenceCoalescer
+from timers import scheduler, spawn
+from wire import CompiledMessage, JSON, encode, negotiate
+from questionbank import GameCursor
+from journal import open_journal
+from resume import EventRing, RESUME_GRACE
+from ratelimit import InboundGuard, MAX_FRAME
+from assets import StaticAssets
+from spectators import SpectatorHub
+from rotation import new_rotation
+from scoring import ALL, SINGLE, AnswerBuffer, points_for, score_answers
+from metrics import Registry, CONTENT_TYPE, loop_lag_histogram, monitor_loop_lag, start_profiler
+
+# --- metrics ---
+registry = Registry()
+loop_lag = loop_lag_histogram(registry)
+registry.gauge("quiz_active_rooms", "Rooms with at least one connection", callback=lambda: len(rooms))
+registry.gauge("quiz_room_connections", "Open websockets per room", labels=("room",),
+               callback=lambda: {(name,): len(r.manager.active_connections) for name, r in rooms.items()})
+registry.gauge("quiz_pending_timers", "Deadlines waiting on the shared scheduler", callback=lambda: scheduler.pending)
+registry.gauge("quiz_outbound_queue_frames", "Frames waiting in client send queues", labels=("stat",),
+               callback=lambda: queue_depths())
+broadcast_encode = registry.histogram("quiz_broadcast_encode_seconds", "Time to JSON-encode one broadcast")
+broadcast_enqueue = registry.histogram("quiz_broadcast_enqueue_seconds", "Time to hand one encoded broadcast to every client queue")
+send_time = registry.histogram("quiz_send_seconds", "Time for one websocket send_text")
+answer_latency = registry.histogram("quiz_answer_to_result_seconds", "From receiving an answer to the result being queued for the room")
+slow_drops = registry.counter("quiz_slow_client_drops_total", "Clients closed for falling behind their send queue")
+inbound_dropped = registry.counter("quiz_inbound_dropped_total", "Client messages rejected before handling", labels=("reason",))
+registry.gauge("quiz_spectators", "Open spectator streams", callback=lambda: spectators.watchers)
+notices_suppressed = registry.counter("quiz_error_notices_suppressed_total", "Error replies swallowed by the per-connection throttle")
+
+profiler = None
+
+@asynccontextmanager
+async def lifespan(app):
+    global profiler
+    lag_task = asyncio.create_task(monitor_loop_lag(loop_lag))
+    profiler = start_profiler()
+    if journal:
+        restore_rooms()
+        journal.start()
+        snapshot_task = asyncio.create_task(journal.run_snapshots(export_rooms))
+    yield
+    lag_task.cancel()
+    if profiler:
+        profiler.stop()
+    if journal:
+        snapshot_task.cancel()
+        await journal.snapshot(export_rooms)
+        journal.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+
+# read and precompressed once; served from memory with ETags and 304s
+assets = StaticAssets("static")
+
+@app.api_route("/", methods=["GET", "HEAD"])
+async def get(request: Request):
+    return assets.response(request, "index.html")
+
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"])
+async def get_static(request: Request, path: str):
+    return assets.response(request, path)
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+@app.get("/debug/profile")
+async def get_profile():
+    # collapsed stacks; only populated when QUIZ_PROFILE_HZ is set
+    return PlainTextResponse(profiler.collapsed() if profiler else "")
 
 questions = [
     {
@@ -107,170 +173,579 @@ questions = [
 ]
 
 
+def compile_question(q: dict) -> CompiledMessage:
+    # public part only: "correct" never leaves the server
+    return CompiledMessage({"type": "question", "question": q["question"], "answers": q["answers"]})
+
+question_frames = [compile_question(q) for q in questions]
+
+
 TOTAL_QUESTIONS = 10  
+NEXT_QUESTION_DELAY = 1  # seconds between a result and the next question
+SEND_QUEUE_SIZE = 64  # frames a client may fall behind before it is dropped as too slow
+ANSWER_WINDOW = 15  # seconds everyone gets to answer in an "all" room
+RESUME_WINDOW = 120  # seconds an empty room keeps its scores for returning players
+
+
+class Outbox:
+    """Bounded per-connection send queue drained by its own sender task."""
+
+    def __init__(self, websocket: WebSocket, maxsize: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.task = asyncio.create_task(self._drain())
+
+    async def _drain(self):
+        try:
+            while True:
+                frame = await self.queue.get()
+                start = time.perf_counter()
+                if isinstance(frame, bytes):
+                    await self.websocket.send_bytes(frame)
+                else:
+                    await self.websocket.send_text(frame)
+                send_time.observe(time.perf_counter() - start)
+        except Exception:
+            # socket is gone; the receive loop takes care of cleanup
+            pass
+
+    def offer(self, frame: str) -> bool:
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def close(self):
+        self.task.cancel()
+
+
+class Client:
+    __slots__ = ("websocket", "username", "outbox", "slot", "encoding")
+
+    def __init__(self, websocket: WebSocket, username: str, outbox: Outbox, slot: int, encoding: str):
+        self.websocket = websocket
+        self.username = username
+        self.outbox = outbox
+        self.slot = slot  # position in the manager's dense lists
+        self.encoding = encoding
+
 
 class ConnectionManager:
-    def __init__(self):
+    def __init__(self, max_queue: int = SEND_QUEUE_SIZE):
+        # dense parallel lists, removed by swapping the last entry into the hole
         self.active_connections: List[WebSocket] = []
         self.usernames: List[str] = []  
-        self.scores = {}
+        self.clients: Dict[WebSocket, Client] = {}
+        self.encodings = Counter()  # wire encoding -> clients using it
+        self.connections = Counter()  # username -> open connections, so "still here?" is O(1)
+        self.max_queue = max_queue
 
-    async def connect(self, websocket: WebSocket, username: str):
+    async def connect(self, websocket: WebSocket, username: str, encoding: str = JSON):
         await websocket.accept()
+        username = sys.intern(username)
+        self.clients[websocket] = Client(websocket, username, Outbox(websocket, self.max_queue), len(self.active_connections), encoding)
+        self.encodings[encoding] += 1
+        self.connections[username] += 1
         self.active_connections.append(websocket)
         self.usernames.append(username)
-        self.scores[username] = 0
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            idx = self.active_connections.index(websocket)
-            user = self.usernames[idx]
-            del self.usernames[idx]
-            del self.active_connections[idx]
-            if user in self.scores:
-                del self.scores[user]
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        client.outbox.close()
+        self.encodings[client.encoding] -= 1
+        if not self.encodings[client.encoding]:
+            del self.encodings[client.encoding]
+        self.connections[client.username] -= 1
+        if not self.connections[client.username]:
+            del self.connections[client.username]
+        idx = client.slot
+        last_ws = self.active_connections.pop()
+        last_user = self.usernames.pop()
+        if last_ws is not websocket:
+            self.active_connections[idx] = last_ws
+            self.usernames[idx] = last_user
+            self.clients[last_ws].slot = idx
+
+    def drop_slow(self, websocket: WebSocket):
+        # client fell more than max_queue frames behind: close it, its receive loop sees the disconnect
+        slow_drops.inc()
+        self.disconnect(websocket)
+        spawn(self._close(websocket))
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)
+        except Exception:
+            pass
 
     async def send_personal_message(self, message: dict, websocket: WebSocket):
-        await websocket.send_json(message)
+        await self.send_frames([lambda encoding: encode(message, encoding)], websocket)
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            await connection.send_json(message)
+    async def send_frames(self, builds: List[Callable], websocket: WebSocket):
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        for build in builds:
+            if not client.outbox.offer(build(client.encoding)):
+                self.drop_slow(websocket)
+                return
 
-manager = ConnectionManager()
+    async def broadcast(self, message: dict):
+        await self.broadcast_frames(lambda encoding: encode(message, encoding))
+
+    async def broadcast_frames(self, build: Callable):
+        # encode once per wire encoding in use, then hand the same frame to every client's queue
+        with broadcast_encode.time():
+            frames = {encoding: build(encoding) for encoding in self.encodings}
+        with broadcast_enqueue.time():
+            slow = [c.websocket for c in self.clients.values() if not c.outbox.offer(frames[c.encoding])]
+        for websocket in slow:
+            self.drop_slow(websocket)
+
+class GameRoom:
+    """One independent quiz: its own connections, scores and question cursor."""
+
+    def __init__(self, name: str, mode: str = SINGLE):
+        self.name = name
+        self.mode = mode  # SINGLE: one drawn answerer per question; ALL: everyone answers
+        self.manager = ConnectionManager()
+        self.leaderboard = Leaderboard()
+        self.presence_seq = 0
+        self.current_question = None
+        self.current_answerer = None
+        self.question_start_time = None
+        self.asked_questions_count = 0
+        self.deck = GameCursor(range(len(questions)))  # no repeats within a game
+        self.next_question = None  # scheduler timer for the next step: a question, or closing the answer window
+        self.answers = None  # AnswerBuffer while an "all" question is open
+        self.departed: Dict[str, int] = {}  # username -> score, handed back if they rejoin
+        self.away = {}  # username -> grace timer; still seated, just not connected
+        self.sessions: Dict[str, str] = {}  # username -> resume token
+        self.events = EventRing()  # recent broadcasts, replayed to resuming clients
+        self.expiry = None  # scheduler timer that drops the room once it has sat empty
+        self.rotation = new_rotation(name)  # connected players; everyone answers once before anyone twice
+
+    async def ask_question(self):
+        self.next_question = None
+        manager = self.manager
+
+        if self.asked_questions_count >= TOTAL_QUESTIONS:
+            
+            if len(self.leaderboard) == 0:
+                winner_message = "Oyun bitti! Katılımcı yok."
+            else:
+                max_score = self.leaderboard.top(1)[0]["score"]
+                winners = [e["name"] for e in self.leaderboard.top(len(self.leaderboard)) if e["score"] == max_score]
+                if len(winners) == 1:
+                    winner_message = f"Oyun bitti! Kazanan: {winners[0]} ({max_score} puan)"
+                else:
+                    winner_message = f"Oyun bitti! Berabere kazananlar: {', '.join(winners)} ({max_score} puan)"
+
+            await self.broadcast({
+                "type": "game_over",
+                "message": winner_message,
+                "leaderboard": self.leaderboard.top(LEADERBOARD_TOP)
+            })
+            self.reset_game()
+            return
+
+        if len(manager.active_connections) == 0:
+            return
+
+
+        idx = self.deck.draw()
+        if idx is None:
+            self.deck = GameCursor(range(len(questions)))
+            idx = self.deck.draw()
+        frame = question_frames[idx]
+        self.current_question = questions[idx]
+        self.asked_questions_count += 1
+        record({"e": "asked", "r": self.name, "n": self.asked_questions_count, "mode": self.mode})
+
+        self.question_start_time = asyncio.get_event_loop().time()
+        if self.mode == ALL:
+            self.current_answerer = None
+            self.answers = AnswerBuffer()
+            self.next_question = scheduler.call_later(ANSWER_WINDOW, self.close_answers)
+        else:
+            self.current_answerer = self.rotation.next()
 
-current_question = None
-current_answerer = None
-question_start_time = None
-asked_questions_count = 0  
-question_index = 0  
 
-async def ask_question():
-    global current_question, current_answerer, question_start_time, asked_questions_count, question_index
+        round_fields = {
+            "answerer": self.current_answerer,
+            "question_number": self.asked_questions_count,
+            "total_questions": TOTAL_QUESTIONS,
+            "event_seq": self.events.seq + 1
+        }
+        await self.broadcast_frames(lambda encoding: frame.frame(encoding, round_fields))
 
-    if asked_questions_count >= TOTAL_QUESTIONS:
-        
-        if len(manager.scores) == 0:
-            winner_message = "Oyun bitti! Katılımcı yok."
+    async def broadcast(self, message: dict):
+        message["event_seq"] = self.events.seq + 1
+        await self.broadcast_frames(lambda encoding: encode(message, encoding))
+
+    async def broadcast_frames(self, build: Callable):
+        # every room broadcast is numbered (event_seq) and kept for catch-up
+        self.events.push(build)
+        await self.manager.broadcast_frames(build)
+        spectators.mark(self.name)
+
+    def reset_game(self):
+        self.current_question = None
+        self.current_answerer = None
+        self.answers = None
+        self.question_start_time = None
+        self.asked_questions_count = 0
+        self.deck = GameCursor(range(len(questions)))
+        scheduler.cancel(self.next_question)
+        self.next_question = None
+        self.leaderboard.reset()
+        self.departed.clear()
+        record({"e": "reset", "r": self.name})
+
+    def snapshot(self) -> dict:
+        return {"type": "leaderboard", "leaderboard": self.leaderboard.top(LEADERBOARD_TOP)}
+
+    async def broadcast_score(self, username: str, points: int):
+        # only the rank change goes out; the top-N list rides along when it is affected
+        score, old_rank, new_rank = self.leaderboard.add_score(username, points)
+        record({"e": "score", "r": self.name, "u": username, "p": points})
+        delta = {"type": "leaderboard_delta", "changes": [rank_change(username, username, score, old_rank, new_rank)]}
+        if new_rank <= LEADERBOARD_TOP:
+            delta["top"] = self.leaderboard.top(LEADERBOARD_TOP)
+        await self.broadcast(delta)
+
+    async def join(self, websocket: WebSocket, username: str, encoding: str = JSON, token: str = None, last_seq: int = None):
+        manager = self.manager
+        await manager.connect(websocket, username, encoding)
+        self.rotation.add(username)
+        scheduler.cancel(self.expiry)
+        self.expiry = None
+
+        away = self.away.pop(username, None)
+        seated = away is not None or username in self.leaderboard
+        scheduler.cancel(away)
+        missed = None
+        if seated and token is not None and token == self.sessions.get(username) and last_seq is not None:
+            missed = self.events.since(last_seq)
+        if not seated:
+            self.leaderboard.add(username, score=self.departed.pop(username, 0))
+            self.sessions[username] = secrets.token_urlsafe(16)
+            presence.added(self.name, username, {"name": username})
+
+        await manager.send_personal_message({"type": "session", "token": self.sessions[username], "event_seq": self.events.seq}, websocket)
+        if missed is not None and len(missed) < manager.max_queue:
+            # resumed inside the grace period: only what it missed, the room saw nothing
+            await manager.send_frames(missed, websocket)
         else:
-            max_score = max(manager.scores.values())
-            winners = [user for user, score in manager.scores.items() if score == max_score]
-            if len(winners) == 1:
-                winner_message = f"Oyun bitti! Kazanan: {winners[0]} ({max_score} puan)"
-            else:
-                winner_message = f"Oyun bitti! Berabere kazananlar: {', '.join(winners)} ({max_score} puan)"
+            await self.send_participants(websocket)
+            await manager.send_personal_message(self.snapshot(), websocket)
+
+
+        if len(manager.active_connections) >= 3 and self.current_question is None:
+            await self.ask_question()
+
+    def may_answer(self, username: str) -> bool:
+        if self.mode == ALL:
+            return self.answers is not None and username not in self.answers
+        return username == self.current_answerer
+
+    async def answer(self, websocket: WebSocket, username: str, data_json: dict) -> bool:
+        """False when this user may not answer now; the caller decides whether to tell them."""
+        if not self.may_answer(username):
+            return False
+
+        received = time.perf_counter()
+        answer_time = asyncio.get_event_loop().time() - self.question_start_time
+        selected = data_json["answer"]
+        if self.mode == ALL:
+            # buffered only; close_answers scores the whole window at once
+            if not 0 <= selected < len(self.current_question["answers"]):
+                return False
+            return self.answers.add(username, selected, answer_time)
+
+        self.current_answerer = None  # one answer per question
+        correct = self.current_question["correct"]
+
+        if selected == correct:
+            points = points_for(answer_time, True)
+
+            await self.broadcast({
+                "type": "correct",
+                "user": username,
+                "points": points
+            })
+            await self.broadcast_score(username, points)
+        else:
+            await self.broadcast({
+                "type": "wrong",
+                "user": username
+            })
+        answer_latency.observe(time.perf_counter() - received)
+
+        # the delay lives on the shared scheduler, so this socket keeps reading meanwhile
+        self.next_question = scheduler.call_later(NEXT_QUESTION_DELAY, self.ask_question)
+        return True
+
+    async def close_answers(self):
+        answers, self.answers = self.answers, None
+        correct = self.current_question["correct"]
+        awards = {u: p for u, p in score_answers(answers, correct).items() if u in self.leaderboard}
+        for username, points in awards.items():
+            self.leaderboard.add_score(username, points)
+        if awards:
+            record({"e": "scores", "r": self.name, "s": awards})
+        # one message for the whole window instead of correct/wrong + a delta per answer
+        await self.broadcast({
+            "type": "round_result",
+            "correct": correct,
+            "answers": len(answers),
+            "correct_count": len(awards),
+            "leaderboard": self.leaderboard.top(LEADERBOARD_TOP)
+        })
+        self.next_question = scheduler.call_later(NEXT_QUESTION_DELAY, self.ask_question)
 
-        await manager.broadcast({
-            "type": "game_over",
-            "message": winner_message,
-            "scores": manager.scores
+    async def leave(self, websocket: WebSocket, username: str):
+        manager = self.manager
+        manager.disconnect(websocket)
+        if not manager.connections[username]:
+            self.rotation.remove(username)  # no turns while away
+            if username not in self.away and username in self.leaderboard:
+                # keep the seat for RESUME_GRACE (if a failed join got that far); the room only
+                # hears about it if they do not come back
+                self.away[username] = scheduler.call_later(RESUME_GRACE, self.expire, username)
+
+    def expire(self, username: str):
+        self.away.pop(username, None)
+        score = self.leaderboard.remove(username)
+        if score:
+            self.departed[username] = score
+        self.sessions.pop(username, None)
+        presence.removed(self.name, username)
+        release_room(self)
+
+    async def send_participants(self, websocket: WebSocket):
+        # full list: newcomers, and clients that noticed a gap in participants_delta seq
+        await self.manager.send_personal_message({
+            "type": "participants",
+            "seq": self.presence_seq,
+            "participants": self.manager.usernames + list(self.away)
+        }, websocket)
+
+    async def broadcast_presence(self, delta: dict):
+        self.presence_seq += 1
+        await self.broadcast({
+            "type": "participants_delta",
+            "seq": self.presence_seq,
+            "added": [e["name"] for e in delta["added"]],
+            "removed": delta["removed"],
+            "count": len(self.manager.active_connections) + len(self.away)
         })
-        reset_game()
-        return
 
-    if len(manager.active_connections) == 0:
-        return
 
+# room name -> GameRoom; one event loop hosts every game
+rooms: Dict[str, GameRoom] = {}
+DEFAULT_ROOM = "default"
 
-    current_question = questions[question_index % len(questions)]
-    question_index += 1
-    asked_questions_count += 1
+def get_room(name: str, mode: str = SINGLE) -> GameRoom:
+    # mode only matters to whoever creates the room
+    room = rooms.get(name)
+    if room is None:
+        room = rooms[name] = GameRoom(name, mode)
+    return room
 
+def queue_depths() -> dict:
+    depths = [c.outbox.queue.qsize() for r in rooms.values() for c in r.manager.clients.values()]
+    return {("max",): max(depths, default=0), ("total",): sum(depths)}
 
-    current_answerer = random.choice(manager.usernames)
-    question_start_time = asyncio.get_event_loop().time()
+def release_room(room: GameRoom):
+    if room.manager.active_connections or room.away or rooms.get(room.name) is not room:
+        return
+    if room.departed and room.expiry is None:
+        # park it: players coming back (reconnect, server restart) find their scores
+        room.expiry = scheduler.call_later(RESUME_WINDOW, expire_room, room)
+    elif not room.departed:
+        drop_room(room)
+
+def expire_room(room: GameRoom):
+    room.expiry = None
+    if not room.manager.active_connections and rooms.get(room.name) is room:
+        drop_room(room)
+
+def drop_room(room: GameRoom):
+    scheduler.cancel(room.next_question)
+    scheduler.cancel(room.expiry)
+    for timer in room.away.values():
+        scheduler.cancel(timer)
+    del rooms[room.name]
+    spectators.mark(room.name)  # watchers get a final {"closed": true}
+    record({"e": "release", "r": room.name})
+
+async def flush_presence(name: str, delta: dict):
+    room = rooms.get(name)
+    if room is not None:
+        await room.broadcast_presence(delta)
+
+presence = PresenceCoalescer(flush_presence)
+
+
+# --- spectators ---
+# Read-only watchers get an SSE stream of whole-room snapshots, off the player
+# send queues: one snapshot per room, built and encoded at most SPECTATOR_HZ
+# times a second however many are watching.
+async def spectator_snapshot(name: str) -> Optional[dict]:
+    room = rooms.get(name)
+    if room is None:
+        return None
+    q = room.current_question
+    return {
+        "room": name,
+        "mode": room.mode,
+        "participants": len(room.manager.active_connections) + len(room.away),
+        "question": q and {"question": q["question"], "answers": q["answers"]},
+        "answerer": room.current_answerer,
+        "question_number": room.asked_questions_count,
+        "total_questions": TOTAL_QUESTIONS,
+        "leaderboard": room.leaderboard.top(LEADERBOARD_TOP),
+    }
 
+spectators = SpectatorHub(spectator_snapshot)
+
+@app.get("/rooms/{room}/watch")
+async def watch_room(room: str):
+    if room not in rooms:
+        return PlainTextResponse("Oda bulunamadı.", status_code=404)
+    return StreamingResponse(spectators.watch(room), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# --- journal (on when QUIZ_JOURNAL_DIR is set) ---
+# Only scores and game progress are kept; connections and the question in
+# flight are not, so after a restart every room comes back parked and players
+# rejoin under the same username to get their score back.
+journal = open_journal()
+
+def record(event: dict):
+    if journal:
+        journal.append(event)
+
+def export_rooms() -> dict:
+    return {name: {"scores": {**room.departed, **room.leaderboard.scores()}, "asked": room.asked_questions_count, "mode": room.mode}
+            for name, room in rooms.items()}
+
+def restore_rooms():
+    state, events = journal.recover()
+    state = state or {}
+    for event in events:
+        name = event["r"]
+        saved = state.setdefault(name, {"scores": {}, "asked": 0})
+        if event["e"] == "score":
+            saved["scores"][event["u"]] = saved["scores"].get(event["u"], 0) + event["p"]
+        elif event["e"] == "scores":
+            for username, points in event["s"].items():
+                saved["scores"][username] = saved["scores"].get(username, 0) + points
+        elif event["e"] == "asked":
+            saved["asked"], saved["mode"] = event["n"], event.get("mode", SINGLE)
+        elif event["e"] == "reset":
+            saved["scores"], saved["asked"] = {}, 0
+        elif event["e"] == "release":
+            del state[name]
+    for name, saved in state.items():
+        room = get_room(name, saved.get("mode", SINGLE))
+        room.departed = {u: s for u, s in saved["scores"].items() if s}
+        room.asked_questions_count = saved["asked"]
+        release_room(room)
+
+
+NOT_YOUR_TURN = {SINGLE: "Senin sıran değil!", ALL: "Bu soruya zaten cevap verdin."}
+MESSAGE_TYPE = re.compile(r'"type"\s*:\s*"(\w+)"')
+
+async def play(websocket: WebSocket, room: GameRoom, username: str):
+    # ?enc=compact (or msgpack when installed) opts into the short-key wire format;
+    # ?resume=<token>&seq=<last event_seq> picks a dropped session back up
+    params = websocket.query_params
+    seq = params.get("seq")
+    guard = InboundGuard()
+
+    async def reject(message: str):
+        # one notice per NOTICE_INTERVAL, however fast the bad frames come in
+        if guard.notice():
+            await room.manager.send_personal_message({"type": "error", "message": message}, websocket)
+        else:
+            notices_suppressed.inc()
 
-    await manager.broadcast({
-        "type": "scores",
-        "scores": manager.scores
-    })
+    try:
+        # inside the try: a join that fails (accept, a dropped client) still releases the room
+        await room.join(websocket, username, negotiate(params.get("enc", JSON)), params.get("resume"),
+                        int(seq) if seq and seq.isascii() and seq.isdigit() else None)
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            data = message.get("text")
+            if data is None:
+                data = message.get("bytes") or b""
+            if len(data) > MAX_FRAME:
+                inbound_dropped.inc(1, "size")
+                await websocket.close(code=1009)
+                break
+            if not guard.allow():
+                inbound_dropped.inc(1, "rate")
+                continue
+            if isinstance(data, bytes):
+                # the protocol is JSON text only
+                inbound_dropped.inc(1, "invalid")
+                await reject("Geçersiz mesaj.")
+                continue
+
+            # the type is sniffed before parsing, so out-of-turn spam never reaches json.loads
+            match = MESSAGE_TYPE.search(data)
+            kind = match.group(1) if match else None
+            if kind == "answer":
+                if not room.may_answer(username):
+                    await reject(NOT_YOUR_TURN[room.mode])
+                    continue
+                try:
+                    data_json = json.loads(data)
+                except ValueError:
+                    data_json = None
+                if not isinstance(data_json, dict) or not isinstance(data_json.get("answer"), int):
+                    inbound_dropped.inc(1, "invalid")
+                    await reject("Geçersiz mesaj.")
+                    continue
+                if not await room.answer(websocket, username, data_json):
+                    await reject(NOT_YOUR_TURN[room.mode])
+            elif kind == "sync":
+                await room.send_participants(websocket)
+            else:
+                inbound_dropped.inc(1, "invalid")
+                await reject("Geçersiz mesaj.")
 
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # whatever ended the loop, the seat and the room are cleaned up
+        await room.leave(websocket, username)
+        release_room(room)
 
-    await manager.broadcast({
-        "type": "question",
-        "question": current_question["question"],
-        "answers": current_question["answers"],
-        "answerer": current_answerer,
-        "scores": manager.scores,
-        "question_number": asked_questions_count,
-        "total_questions": TOTAL_QUESTIONS
-    })
 
-def reset_game():
-    global current_question, current_answerer, question_start_time, asked_questions_count, question_index
-    current_question = None
-    current_answerer = None
-    question_start_time = None
-    asked_questions_count = 0
-    question_index = 0
-    manager.scores = {user: 0 for user in manager.usernames}
+@app.websocket("/ws/{room}/{username}")
+async def room_endpoint(websocket: WebSocket, room: str, username: str):
+    # ?mode=all makes a new room an "everyone answers" room
+    mode = ALL if websocket.query_params.get("mode") == ALL else SINGLE
+    await play(websocket, get_room(room, mode), username)
 
 
 @app.websocket("/ws/{username}")
 async def websocket_endpoint(websocket: WebSocket, username: str):
-    global current_question
-
-    await manager.connect(websocket, username)
+    await play(websocket, get_room(DEFAULT_ROOM), username)
 
 
-    await manager.broadcast({
-        "type": "info",
-        "message": f"{username} katıldı. Toplam katılımcı: {len(manager.active_connections)}",
-        "scores": manager.scores
-    })
-
-
-    if len(manager.active_connections) >= 3 and current_question is None:
-        await ask_question()
-
-    try:
-        while True:
-            data = await websocket.receive_text()
-            data_json = json.loads(data)
-
-            if data_json["type"] == "answer":
-                if username != current_answerer:
-                    await manager.send_personal_message({
-                        "type": "error",
-                        "message": "Senin sıran değil!"
-                    }, websocket)
-                    continue
-
-                answer_time = asyncio.get_event_loop().time() - question_start_time
-                selected = data_json["answer"]
-                correct = current_question["correct"]
-
-                if selected == correct:
-                    if answer_time <= 5:
-                        points = 5
-                    elif answer_time <= 10:
-                        points = 3
-                    else:
-                        points = 1
-
-                    manager.scores[username] += points
-
-                    await manager.broadcast({
-                        "type": "correct",
-                        "user": username,
-                        "points": points,
-                        "scores": manager.scores
-                    })
-                else:
-                    await manager.broadcast({
-                        "type": "wrong",
-                        "user": username,
-                        "scores": manager.scores
-                    })
-
-                await asyncio.sleep(1)
-                await ask_question()
-
-    except WebSocketDisconnect:
-        manager.disconnect(websocket)
-        await manager.broadcast({
-            "type": "info",
-            "message": f"{username} ayrıldı. Kalan katılımcı: {len(manager.active_connections)}",
-            "scores": manager.scores
-        })
\ No newline at end of file
+if __name__ == "__main__":
+    import uvicorn
+    # the MAX_FRAME check in play() only sees a frame after the server has buffered
+    # it; ws_max_size makes uvicorn refuse bigger frames up front (run it the same
+    # way elsewhere: uvicorn main:app --ws-max-size 4096)
+    uvicorn.run(app, host="0.0.0.0", port=8000, ws_max_size=MAX_FRAME)
@@ -0,0 +1,216 @@
+import asyncio
+import bisect
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+# --- Prometheus-text metrics ---
+# Small in-process registry: hot paths only bump numbers, formatting happens on scrape.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+LabelKey = Tuple[str, ...]
+
+
+def _labels(names: Sequence[str], values: LabelKey, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labels)
+        self.values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, *labels: str):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self.values.items():
+            yield f"{self.name}{_labels(self.labelnames, key)} {value}"
+
+
+class Gauge:
+    """Set directly, or computed at scrape time from a callback returning {label tuple: value}."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = (), callback: Optional[Callable] = None):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labels)
+        self.values: Dict[LabelKey, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, *labels: str):
+        self.values[labels] = value
+
+    def samples(self) -> Iterable[str]:
+        values = self.values
+        if self.callback is not None:
+            result = self.callback()
+            values = result if isinstance(result, dict) else {(): result}
+        for key, value in values.items():
+            yield f"{self.name}{_labels(self.labelnames, key)} {value}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, buckets: Sequence[float] = LATENCY_BUCKETS, labels: Sequence[str] = ()):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series: Dict[LabelKey, list] = {}  # labels -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *labels: str):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def samples(self) -> Iterable[str]:
+        for key, series in self.series.items():
+            running = 0
+            for bound, count in zip(self.buckets, series):
+                running += count
+                le = _labels(self.labelnames, key, 'le="%s"' % bound)
+                yield f"{self.name}_bucket{le} {running}"
+            running += series[len(self.buckets)]
+            le = _labels(self.labelnames, key, 'le="+Inf"')
+            yield f"{self.name}_bucket{le} {running}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {series[-1]}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {running}"
+
+
+class _Timer:
+    __slots__ = ("hist", "labels", "start")
+
+    def __init__(self, hist: Histogram, labels: LabelKey):
+        self.hist, self.labels = hist, labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self._add(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self._add(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self._add(Histogram(*args, **kwargs))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for m in self.metrics:
+            lines.append(f"# HELP {m.name} {m.doc}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.samples())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# --- event loop lag ---
+
+def loop_lag_histogram(registry: Registry) -> Histogram:
+    return registry.histogram("quiz_event_loop_lag_seconds", "Delay between a scheduled wakeup and when the loop ran it")
+
+
+async def monitor_loop_lag(hist: Histogram, interval: float = 0.25):
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        hist.observe(max(0.0, loop.time() - start - interval))
+
+
+# --- optional sampling profiler ---
+
+class SamplingProfiler:
+    """Samples the event-loop thread's stack from a side thread; output is collapsed-stack text
+    (feed it to flamegraph.pl / speedscope). Enabled with QUIZ_PROFILE_HZ."""
+
+    def __init__(self, hz: float):
+        self.interval = 1.0 / hz
+        self.stacks = _Tally()
+        self.target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="quiz-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+def start_profiler() -> Optional[SamplingProfiler]:
+    hz = float(os.environ.get("QUIZ_PROFILE_HZ") or 0)
+    if hz <= 0:
+        return None
+    profiler = SamplingProfiler(hz)
+    profiler.start()
+    return profiler
+
+
+# --- logging ---
+
+def setup_logging(name: str) -> logging.Logger:
+    """Log records are queued on the loop thread and written by a listener thread."""
+    logger = logging.getLogger(name)
+    if logger.handlers:
+        return logger
+    records = queue.SimpleQueue()
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    listener = logging.handlers.QueueListener(records, stream)
+    listener.start()
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    logger.setLevel(os.environ.get("QUIZ_LOG_LEVEL", "INFO"))
+    logger.propagate = False
+    return logger
@@ -0,0 +1,72 @@
+import sys
+from typing import Dict, Iterator, List, Optional
+
+
+class Participant:
+    __slots__ = ("handle", "pid", "name", "sid", "is_moderator", "token")
+
+    def __init__(self, handle: int, pid: str, name: str, sid: str, is_moderator: bool, token: Optional[str] = None):
+        self.handle = handle
+        self.pid = pid
+        self.name = name
+        self.sid = sid
+        self.is_moderator = is_moderator
+        self.token = token
+
+    def as_dict(self, score: int = 0) -> dict:
+        return {"name": self.name, "sid": self.sid, "score": score, "is_moderator": self.is_moderator}
+
+
+class ParticipantTable:
+    """Slot-reusing table of __slots__ records addressed by small integer handles.
+
+    Names are interned (rooms repeat "Anon" and friends a lot), lookups by pid
+    are O(1) dict hits, and removal frees the slot for the next joiner instead
+    of shifting a list.
+    """
+
+    def __init__(self):
+        self._records: List[Optional[Participant]] = []
+        self._free: List[int] = []
+        self._by_pid: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_pid)
+
+    def __contains__(self, pid: str) -> bool:
+        return pid in self._by_pid
+
+    def __iter__(self) -> Iterator[Participant]:
+        return (r for r in self._records if r is not None)
+
+    def add(self, pid: str, name: str, sid: str, is_moderator: bool = False, token: Optional[str] = None) -> Participant:
+        handle = self._free.pop() if self._free else len(self._records)
+        record = Participant(handle, pid, sys.intern(name), sid, is_moderator, token)
+        if handle == len(self._records):
+            self._records.append(record)
+        else:
+            self._records[handle] = record
+        self._by_pid[pid] = handle
+        return record
+
+    def remove(self, pid: str) -> Optional[Participant]:
+        handle = self._by_pid.pop(pid, None)
+        if handle is None:
+            return None
+        record = self._records[handle]
+        self._records[handle] = None
+        self._free.append(handle)
+        return record
+
+    def rebind(self, pid: str, sid: str) -> Optional[Participant]:
+        record = self.get(pid)
+        if record is not None:
+            record.sid = sid
+        return record
+
+    def get(self, pid: str) -> Optional[Participant]:
+        handle = self._by_pid.get(pid)
+        return self._records[handle] if handle is not None else None
+
+    def pids(self) -> List[str]:
+        return list(self._by_pid)
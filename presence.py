@@ -0,0 +1,68 @@
+from typing import Awaitable, Callable, Dict
+from timers import scheduler, spawn
+
+COALESCE_WINDOW = 0.05  # seconds a join/leave burst is merged before one delta goes out
+
+
+class PresenceBatch:
+    __slots__ = ("added", "removed", "changed", "timer")
+
+    def __init__(self):
+        self.timer = None
+        self.added: Dict[str, dict] = {}
+        self.removed = set()
+        self.changed: Dict[str, dict] = {}
+
+    def as_delta(self) -> dict:
+        return {
+            "added": list(self.added.values()),
+            "removed": list(self.removed),
+            "changed": list(self.changed.values()),
+        }
+
+
+class PresenceCoalescer:
+    """Collects participant adds/removes/changes per room and flushes each burst once.
+
+    Deltas are idempotent (adding a known id overwrites it, removing an unknown
+    id is a no-op), so a client that got a full snapshot can safely apply a
+    delta whose changes the snapshot already contained.
+    """
+
+    def __init__(self, flush: Callable[[str, dict], Awaitable], window: float = COALESCE_WINDOW):
+        self.flush = flush
+        self.window = window
+        self.pending: Dict[str, PresenceBatch] = {}
+
+    def _batch(self, room: str) -> PresenceBatch:
+        batch = self.pending.get(room)
+        if batch is None:
+            batch = self.pending[room] = PresenceBatch()
+            batch.timer = scheduler.call_later(self.window, self._fire, room)
+        return batch
+
+    def discard(self, room: str):
+        """Drops a room's unsent batch, e.g. when the room itself is gone."""
+        batch = self.pending.pop(room, None)
+        if batch is not None:
+            scheduler.cancel(batch.timer)
+
+    def added(self, room: str, key: str, entry: dict):
+        batch = self._batch(room)
+        if key in batch.removed:
+            # left and came back inside one window: same id, new details
+            batch.removed.discard(key)
+            batch.changed[key] = entry
+        else:
+            batch.added[key] = entry
+
+    def removed(self, room: str, key: str):
+        batch = self._batch(room)
+        batch.changed.pop(key, None)
+        if batch.added.pop(key, None) is None:
+            batch.removed.add(key)
+
+    def _fire(self, room: str):
+        batch = self.pending.pop(room, None)
+        if batch and (batch.added or batch.removed or batch.changed):
+            spawn(self.flush(room, batch.as_delta()))
@@ -0,0 +1,230 @@
+import os
+import json
+import random
+import sqlite3
+import asyncio
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import AsyncIterator, Iterable, List, Optional, Sequence, Union
+
+IMPORT_BATCH = 500  # rows per transaction while streaming an import
+CACHE_SIZE = 4096  # decoded questions kept in memory per process
+ID_CACHE_SIZE = 32  # bank selections whose id arrays are kept in memory per process
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    bank TEXT NOT NULL,
+    category TEXT,
+    text TEXT NOT NULL,
+    choices TEXT NOT NULL,
+    correct_index INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS questions_bank_category ON questions (bank, category);
+CREATE TABLE IF NOT EXISTS question_tags (
+    question_id INTEGER NOT NULL REFERENCES questions (id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (tag, question_id)
+) WITHOUT ROWID;
+"""
+
+
+class QuestionBank:
+    """SQLite-backed question store, opened lazily on first use.
+
+    Every call runs on one dedicated thread so the event loop never waits on
+    disk and the connection is never shared across threads. Meetings keep only
+    a deck position (see deck_entry); it is resolved through one id array per
+    selection shared by every meeting, and bodies are fetched on demand through
+    a small LRU cache, so a large bank is never copied into each meeting.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="questionbank")
+        self._get_cached = lru_cache(maxsize=CACHE_SIZE)(self._get)
+        self._id_cache: "OrderedDict[tuple, array]" = OrderedDict()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA foreign_keys=ON")
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    # --- import ---
+
+    def _insert(self, bank: str, rows: List[dict]) -> int:
+        db = self._conn()
+        with db:
+            for row in rows:
+                cur = db.execute(
+                    "INSERT INTO questions (bank, category, text, choices, correct_index) VALUES (?, ?, ?, ?, ?)",
+                    (bank, row.get("category"), row["text"], json.dumps(row["choices"], ensure_ascii=False), row["correct_index"]))
+                tags = row.get("tags") or ()
+                if tags:
+                    db.executemany("INSERT OR IGNORE INTO question_tags (question_id, tag) VALUES (?, ?)",
+                                   [(cur.lastrowid, t) for t in tags])
+        return len(rows)
+
+    async def import_lines(self, bank: str, lines: AsyncIterator[bytes]) -> dict:
+        """Streams NDJSON (one question per line) into the bank in batches."""
+        imported, rejected, batch = 0, 0, []
+        async for line in _split_lines(lines):
+            row = _parse(line)
+            if row is None:
+                rejected += 1
+                continue
+            batch.append(row)
+            if len(batch) >= IMPORT_BATCH:
+                imported += await self._run(self._insert, bank, batch)
+                batch = []
+        if batch:
+            imported += await self._run(self._insert, bank, batch)
+        return {"imported": imported, "rejected": rejected}
+
+    # --- reads ---
+
+    def _select(self, what: str, bank: str, category: Optional[str], tag: Optional[str], tail: str = ""):
+        sql = f"SELECT {what} FROM questions q"
+        args = []
+        if tag:
+            sql += " JOIN question_tags t ON t.question_id = q.id AND t.tag = ?"
+            args.append(tag)
+        sql += " WHERE q.bank = ?"
+        args.append(bank)
+        if category:
+            sql += " AND q.category = ?"
+            args.append(category)
+        return self._conn().execute(sql + tail, args)
+
+    def _ids(self, bank: str, category: Optional[str], tag: Optional[str]) -> array:
+        # ascending ids: imports only append, so a position keeps naming the same question
+        return array("q", (r[0] for r in self._select("q.id", bank, category, tag, " ORDER BY q.id")))
+
+    async def ids(self, bank: str, category: Optional[str] = None, tag: Optional[str] = None) -> array:
+        return await self._run(self._ids, bank, category, tag)
+
+    async def id_at(self, bank: str, category: Optional[str], tag: Optional[str], position: int) -> Optional[int]:
+        """Id at `position` in a selection, from an id array shared by every meeting using it."""
+        key = (bank, category, tag)
+        ids = self._id_cache.get(key)
+        if ids is None or position >= len(ids):
+            ids = self._id_cache[key] = await self.ids(bank, category, tag)  # new or grown since cached
+            if len(self._id_cache) > ID_CACHE_SIZE:
+                self._id_cache.popitem(last=False)
+        self._id_cache.move_to_end(key)
+        return ids[position] if position < len(ids) else None
+
+    def _get(self, qid: int) -> Optional[dict]:
+        row = self._conn().execute("SELECT text, choices, correct_index FROM questions WHERE id = ?", (qid,)).fetchone()
+        if row is None:
+            return None
+        text, choices, correct_index = row
+        ref = f"bank:{qid}"
+        choices = json.loads(choices)
+        return {"id": ref, "text": text, "choices": choices, "correct_index": correct_index,
+                "public": {"id": ref, "text": text, "choices": choices}}
+
+    async def get(self, qid: int) -> Optional[dict]:
+        return await self._run(self._get_cached, qid)
+
+    async def count(self, bank: str, category: Optional[str] = None, tag: Optional[str] = None) -> int:
+        return await self._run(lambda: self._select("COUNT(*)", bank, category, tag).fetchone()[0])
+
+
+class GameCursor:
+    """Pre-shuffled deck of question refs: O(1) draws, no repeats until the deck is used up."""
+
+    __slots__ = ("deck",)
+
+    def __init__(self, refs: Iterable, rng: Optional[random.Random] = None):
+        self.deck = list(refs)
+        (rng or random).shuffle(self.deck)
+
+    def __len__(self):
+        return len(self.deck)
+
+    def draw(self):
+        return self.deck.pop() if self.deck else None
+
+
+def shuffled_position(index: int, size: int, seed: int) -> int:
+    """Where draw number `index` lands in a seeded pseudo-random order of range(size).
+
+    A four-round Feistel network over the next even power of two, cycle-walked
+    back into range (at most 4x expected steps): O(1) per draw, same seed same
+    order, and the shuffled order itself is never stored.
+    """
+    bits = max(2, (size - 1).bit_length())
+    bits += bits & 1
+    half = bits // 2
+    mask = (1 << half) - 1
+    keys = [(seed * (k + 1) + k * 0x632BE5AB) & 0xFFFFFFFF for k in range(4)]
+    x = index
+    while True:
+        left, right = x >> half, x & mask
+        for key in keys:
+            left, right = right, left ^ (_mix(right, key) & mask)
+        x = (left << half) | right
+        if x < size:
+            return x
+
+
+def _mix(value: int, key: int) -> int:
+    # murmur3's 32-bit finalizer: every output bit depends on every input bit
+    value = (value ^ key) & 0xFFFFFFFF
+    value = ((value ^ (value >> 16)) * 0x85EBCA6B) & 0xFFFFFFFF
+    value = ((value ^ (value >> 13)) * 0xC2B2AE35) & 0xFFFFFFFF
+    return value ^ (value >> 16)
+
+
+def deck_entry(refs: Sequence[str], bank_size: int, seed: int, index: int) -> Union[str, int, None]:
+    """Draw number `index` of a deck over ad-hoc question ids plus a bank selection.
+
+    Returns an ad-hoc id (str), a position in the bank selection (int, see
+    QuestionBank.id_at) or None once the deck is used up.
+    """
+    total = len(refs) + bank_size
+    if index >= total:
+        return None
+    position = shuffled_position(index, total, seed)
+    return refs[position] if position < len(refs) else position - len(refs)
+
+
+async def _split_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if pending.strip():
+        yield pending
+
+
+def _parse(line: bytes) -> Optional[dict]:
+    try:
+        row = json.loads(line)
+        choices = row["choices"]
+        correct = row["correct_index"]
+        if not isinstance(row["text"], str) or not isinstance(choices, list) or not 0 <= int(correct) < len(choices):
+            return None
+        tags = row.get("tags") or []
+        if not isinstance(tags, list):
+            return None
+        return {"text": row["text"], "choices": [str(c) for c in choices], "correct_index": int(correct),
+                "category": row.get("category"), "tags": [str(t) for t in tags]}
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+bank = QuestionBank(os.environ.get("QUIZ_BANK_PATH", "questions.db"))
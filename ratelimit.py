@@ -0,0 +1,40 @@
+import time
+
+# bytes; nothing a client legitimately sends comes close. Give the server the same limit
+# (uvicorn --ws-max-size) so bigger frames are refused before they are buffered at all
+MAX_FRAME = 4096
+RATE = 5.0  # sustained inbound messages per second per connection
+BURST = 10  # messages allowed back to back before the rate applies
+NOTICE_INTERVAL = 2.0  # seconds between error notices to one connection
+
+
+class InboundGuard:
+    """Per-connection token bucket plus an error-notice throttle.
+
+    allow() is checked before a message is parsed or handled; notice() says
+    whether an error may be sent now, so errors inside one NOTICE_INTERVAL
+    collapse into the first.
+    """
+
+    __slots__ = ("tokens", "stamp", "last_notice")
+
+    def __init__(self):
+        self.tokens = float(BURST)
+        self.stamp = time.monotonic()
+        self.last_notice = float("-inf")
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(BURST, self.tokens + (now - self.stamp) * RATE)
+        self.stamp = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def notice(self) -> bool:
+        now = time.monotonic()
+        if now - self.last_notice < NOTICE_INTERVAL:
+            return False
+        self.last_notice = now
+        return True
@@ -0,0 +1,31 @@
+from collections import deque
+from itertools import islice
+from typing import List, Optional
+
+RESUME_GRACE = 30  # seconds a dropped connection keeps its seat before the room sees it leave
+RING_SIZE = 256  # room events kept for replay to reconnecting clients
+
+
+class EventRing:
+    """Last `size` room events, numbered from 1, for catch-up after a reconnect.
+
+    since(seq) gives what a client that last saw `seq` missed, or None when
+    that is no longer (or was never) in the buffer and it needs a full snapshot.
+    """
+
+    __slots__ = ("seq", "events")
+
+    def __init__(self, size: int = RING_SIZE):
+        self.seq = 0
+        self.events = deque(maxlen=size)
+
+    def push(self, item) -> int:
+        self.seq += 1
+        self.events.append(item)
+        return self.seq
+
+    def since(self, seq: int) -> Optional[List]:
+        first = self.seq - len(self.events) + 1
+        if seq > self.seq or seq + 1 < first:
+            return None
+        return list(islice(self.events, seq + 1 - first, None))
@@ -0,0 +1,78 @@
+import os
+import random
+from typing import Dict, Hashable, List, Optional
+
+
+class Rotation:
+    """Answerer order where everyone gets a turn before anyone gets a second.
+
+    A lazy Fisher-Yates shuffle: items[:cursor] have been picked this pass,
+    next() swaps a random unpicked item to the cursor. Picking, adding a late
+    joiner (unpicked, so they still get a turn this pass) and removing someone
+    are all O(1); nothing is rebuilt between passes. Same seed, same calls,
+    same order.
+    """
+
+    __slots__ = ("items", "index", "cursor", "rng")
+
+    def __init__(self, seed=None):
+        self.items: List[Hashable] = []
+        self.index: Dict[Hashable, int] = {}
+        self.cursor = 0
+        self.rng = random.Random(seed)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, key) -> bool:
+        return key in self.index
+
+    def _place(self, key: Hashable, pos: int):
+        self.items[pos] = key
+        self.index[key] = pos
+
+    def add(self, key: Hashable) -> bool:
+        if key in self.index:
+            return False
+        self.index[key] = len(self.items)
+        self.items.append(key)
+        return True
+
+    def remove(self, key: Hashable) -> bool:
+        pos = self.index.pop(key, None)
+        if pos is None:
+            return False
+        items = self.items
+        if pos < self.cursor:
+            # keep the picked part contiguous: its last entry fills the hole
+            self.cursor -= 1
+            if pos != self.cursor:
+                self._place(items[self.cursor], pos)
+                pos = self.cursor
+        last = items.pop()
+        if pos < len(items):
+            self._place(last, pos)
+        return True
+
+    def next(self) -> Optional[Hashable]:
+        items = self.items
+        if not items:
+            return None
+        if self.cursor == len(items):
+            # everyone had a turn: start a new pass, skipping the last slot (the
+            # previous pick) so nobody answers twice in a row across passes
+            self.cursor = 0
+            j = self.rng.randrange(len(items) - 1) if len(items) > 1 else 0
+        else:
+            j = self.rng.randrange(self.cursor, len(items))
+        key = items[j]
+        self._place(items[self.cursor], j)
+        self._place(key, self.cursor)
+        self.cursor += 1
+        return key
+
+
+def new_rotation(room: str) -> Rotation:
+    """Seeded per room from QUIZ_ROTATION_SEED when set, for a reproducible order."""
+    seed = os.environ.get("QUIZ_ROTATION_SEED")
+    return Rotation(f"{seed}:{room}" if seed is not None else None)
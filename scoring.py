@@ -0,0 +1,78 @@
+from array import array
+from typing import Dict, Hashable, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # optional: the pure-Python pass gives the same points
+    np = None
+
+# "everyone answers" rounds: every participant gets one answer per question
+ALL = "all"
+SINGLE = "single"
+
+POINT_TIERS = ((5.0, 5), (10.0, 3))  # (answered within seconds, points), tightest first
+LATE_POINTS = 1  # a correct answer after the last tier
+
+
+def points_for(elapsed: float, correct: bool, limit: Optional[float] = None) -> int:
+    """Points for one answer; answers after `limit` seconds (if given) score nothing."""
+    if not correct or (limit is not None and elapsed > limit):
+        return 0
+    for within, points in POINT_TIERS:
+        if elapsed <= within:
+            return points
+    return LATE_POINTS
+
+
+class AnswerBuffer:
+    """Answers to one question as parallel columns: row -> (key, choice, elapsed).
+
+    Only the first answer per key is kept. Choices and times live in typed
+    arrays, so a round with thousands of answers is a few flat buffers that
+    score_answers() handles in one pass.
+    """
+
+    __slots__ = ("keys", "rows", "choices", "times")
+
+    def __init__(self):
+        self.keys: List[Hashable] = []
+        self.rows: Dict[Hashable, int] = {}
+        self.choices = array("h")
+        self.times = array("d")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key) -> bool:
+        return key in self.rows
+
+    def add(self, key: Hashable, choice: int, elapsed: float) -> bool:
+        if key in self.rows:
+            return False
+        self.rows[key] = len(self.keys)
+        self.keys.append(key)
+        self.choices.append(choice)
+        self.times.append(elapsed)
+        return True
+
+
+def score_answers(buffer: AnswerBuffer, correct_index: int, limit: Optional[float] = None) -> Dict[Hashable, int]:
+    """key -> points for every answer that scored, same rules as points_for()."""
+    if not len(buffer):
+        return {}
+    if np is not None:
+        times = np.frombuffer(buffer.times, dtype=np.float64)
+        points = np.full(len(times), LATE_POINTS, dtype=np.int64)
+        for within, value in reversed(POINT_TIERS):
+            points[times <= within] = value
+        points[np.frombuffer(buffer.choices, dtype=np.int16) != correct_index] = 0
+        if limit is not None:
+            points[times > limit] = 0
+        keys = buffer.keys
+        return {keys[i]: int(points[i]) for i in np.flatnonzero(points)}
+    awarded = {}
+    for key, choice, elapsed in zip(buffer.keys, buffer.choices, buffer.times):
+        points = points_for(elapsed, choice == correct_index, limit)
+        if points:
+            awarded[key] = points
+    return awarded
@@ -1,27 +1,133 @@
+import os
 import time
+import uuid
 import random
+import secrets
 import asyncio
-import uuid
-from typing import List
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+import functools
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import socketio
+from store import make_store, make_client_manager
+from leaderboard import LEADERBOARD_TOP, rank_change
+from presence import PresenceCoalescer
+from timers import scheduler
+from resume import RESUME_GRACE
+from ratelimit import InboundGuard, MAX_FRAME
+from assets import StaticAssets
+from spectators import SpectatorHub
+from scoring import ALL, SINGLE, points_for, score_answers
+from wire import SocketIOJson
+from questionbank import bank as question_bank
+from metrics import Registry, CONTENT_TYPE, loop_lag_histogram, monitor_loop_lag, start_profiler, setup_logging
+
+log = setup_logging("quiz.server")
+
+# --- metrics ---
+registry = Registry()
+loop_lag = loop_lag_histogram(registry)
+registry.gauge("quiz_active_rooms", "Meetings with a connection on this worker",
+               callback=lambda: len(set(mid for mid, _ in sid_map.values())))
+registry.gauge("quiz_room_connections", "Connections per meeting on this worker", labels=("room",),
+               callback=lambda: {(mid,): n for mid, n in Counter(mid for mid, _ in sid_map.values()).items()})
+registry.gauge("quiz_pending_timers", "Deadlines waiting on the shared scheduler", callback=lambda: scheduler.pending)
+registry.gauge("quiz_outbound_queue_packets", "Packets waiting in Engine.IO client queues", labels=("stat",),
+               callback=lambda: queue_depths())
+room_emit_time = registry.histogram("quiz_broadcast_seconds", "Time to encode and send one room emit", labels=("event",))
+evictions = registry.counter("quiz_meetings_evicted_total", "Meetings dropped by the idle sweeper or the meeting cap", labels=("reason",))
+answer_latency = registry.histogram("quiz_answer_to_result_seconds", "From receiving an answer to round_result being sent")
+inbound_dropped = registry.counter("quiz_inbound_dropped_total", "Client events rejected before handling", labels=("reason",))
+registry.gauge("quiz_spectators", "Open spectator streams on this worker", callback=lambda: spectators.watchers)
+notices_suppressed = registry.counter("quiz_error_notices_suppressed_total", "error_msg replies swallowed by the per-connection throttle")
+
+profiler = None
+
+@asynccontextmanager
+async def lifespan(app):
+    global profiler
+    lag_task = asyncio.create_task(monitor_loop_lag(loop_lag))
+    profiler = start_profiler()
+    journal = getattr(store, "journal", None)
+    if journal:
+        await store.restore()
+        journal.start()
+        await resume_round_timers()
+        snapshot_task = asyncio.create_task(journal.run_snapshots(store.export))
+        log.info("recovered %d meetings from %s", len(store.meetings), journal.directory)
+    sweeper = asyncio.create_task(sweep_meetings())
+    yield
+    sweeper.cancel()
+    lag_task.cancel()
+    if profiler:
+        profiler.stop()
+    if journal:
+        snapshot_task.cancel()
+        await journal.snapshot(store.export)
+        journal.stop()
 
 # --- Socket.IO async server ---
-sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
-fastapi_app = FastAPI()
+sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*", client_manager=make_client_manager(), json=SocketIOJson,
+                           max_http_buffer_size=MAX_FRAME)
+fastapi_app = FastAPI(lifespan=lifespan)
 app = socketio.ASGIApp(sio, fastapi_app)
 
-# serve static files (index.html)
-fastapi_app.mount("/", StaticFiles(directory="static", html=True), name="static")
+def queue_depths() -> dict:
+    depths = [s.queue.qsize() for s in sio.eio.sockets.values()]
+    return {("max",): max(depths, default=0), ("total",): sum(depths)}
+
+async def room_emit(event: str, data: dict, meeting_id: str):
+    # numbered and kept in the meeting's event ring so a resuming client can catch up
+    data["event_seq"] = await store.push_event(meeting_id, event, data)
+    # python-socketio encodes a room emit once and waits for every send
+    with room_emit_time.time(event):
+        await sio.emit(event, data, room=meeting_id)
+    spectators.mark(meeting_id)
+
+# --- Meeting state (in-memory, or Redis when QUIZ_REDIS_URL is set) ---
+store = make_store()
+
+# --- Meeting lifecycle ---
+# Any client can create a meeting by naming it, so their number and size are capped
+# and meetings nobody has used for MEETING_TTL are dropped by a background sweep.
+MAX_MEETINGS = int(os.environ.get("QUIZ_MAX_MEETINGS", 1000))
+MAX_PARTICIPANTS = int(os.environ.get("QUIZ_MAX_PARTICIPANTS", 5000))  # per meeting
+MAX_QUESTIONS = int(os.environ.get("QUIZ_MAX_QUESTIONS", 500))  # ad-hoc questions per meeting
+MEETING_TTL = float(os.environ.get("QUIZ_MEETING_TTL", 3600))  # seconds idle (and empty) before eviction
+SWEEP_INTERVAL = 60
 
-# --- In-memory storage (prototype) ---
-meetings = {}  # meeting_id -> {participants: {pid: {...}}, questions: [...], current_round: {...}}
+async def ensure_meeting(mid: str) -> bool:
+    """Creates the meeting if needed, evicting the least recently active empty one at the cap.
+    False when the server is full."""
+    if not await store.has_meeting(mid) and await store.meeting_count() >= MAX_MEETINGS:
+        evicted = await store.evict_lru()
+        if evicted is None:
+            return False
+        forget_meeting(evicted, "cap")
+    await store.ensure_meeting(mid)
+    await store.touch(mid)
+    return True
 
-def ensure_meeting(mid: str):
-    if mid not in meetings:
-        meetings[mid] = {"participants": {}, "questions": [], "current_round": None}
+def forget_meeting(mid: str, reason: str):
+    # process-local state the store does not know about
+    scheduler.cancel(round_timers.pop(mid, None))
+    presence.discard(mid)
+    evictions.inc(1, reason)
+    spectators.mark(mid)  # watchers get a final {"closed": true}
+    log.info("evicted meeting %s (%s)", mid, reason)
+
+async def sweep_meetings():
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        try:
+            for mid in await store.evict_idle(MEETING_TTL):
+                forget_meeting(mid, "idle")
+        except Exception:
+            # a store hiccup (Redis down for a moment) must not end the sweeper for good
+            log.exception("meeting sweep failed")
 
 class QuestionIn(BaseModel):
     text: str
@@ -31,172 +137,458 @@ class QuestionIn(BaseModel):
 # API to add question (useful for admin or curl)
 @fastapi_app.post("/meetings/{meeting_id}/questions")
 async def add_question(meeting_id: str, q: QuestionIn):
-    ensure_meeting(meeting_id)
+    if not await ensure_meeting(meeting_id):
+        raise HTTPException(503, "Too many meetings")
+    if await store.question_count(meeting_id) >= MAX_QUESTIONS:
+        raise HTTPException(409, f"A meeting can hold at most {MAX_QUESTIONS} questions")
     qid = str(uuid.uuid4())
-    meetings[meeting_id]["questions"].append({
+    await store.add_question(meeting_id, {
         "id": qid,
         "text": q.text,
         "choices": q.choices,
-        "correct_index": q.correct_index
+        "correct_index": q.correct_index,
+        # built once here instead of on every start_round
+        "public": {"id": qid, "text": q.text, "choices": q.choices}
     })
     return {"ok": True, "id": qid}
 
-# helper: broadcast participants
-async def broadcast_participants(meeting_id: str):
-    m = meetings[meeting_id]
-    lst = [{"id": pid, "name": p["name"], "score": p["score"], "is_moderator": p.get("is_moderator", False)} for pid,p in m["participants"].items()]
-    await sio.emit("participants_update", lst, room=meeting_id)
+# bulk import: NDJSON body, one {text, choices, correct_index, category?, tags?} per line
+@fastapi_app.post("/banks/{bank_name}/import")
+async def import_bank(bank_name: str, request: Request):
+    result = await question_bank.import_lines(bank_name, request.stream())
+    return {"ok": True, **result}
+
+class BankIn(BaseModel):
+    bank: str
+    category: Optional[str] = None
+    tag: Optional[str] = None
+
+# draw this meeting's rounds from a bank (on top of questions POSTed to the meeting)
+@fastapi_app.put("/meetings/{meeting_id}/bank")
+async def use_bank(meeting_id: str, sel: BankIn):
+    if not await ensure_meeting(meeting_id):
+        raise HTTPException(503, "Too many meetings")
+    await store.set_bank(meeting_id, sel.model_dump())
+    await store.set_deck(meeting_id)  # the next draw builds a deck over the new selection
+    return {"ok": True, "questions": await question_bank.count(sel.bank, sel.category, sel.tag)}
+
+async def draw_question(meeting_id: str) -> Optional[dict]:
+    ref = await store.draw_question(meeting_id)
+    sel = None
+    if ref is None:
+        # deck used up or never built: a fresh seeded order over every source. The
+        # deck holds the ad-hoc ids, the bank selection's size and a seed, never bank ids.
+        refs = await store.question_ids(meeting_id)
+        sel = await store.get_bank(meeting_id)
+        size = await question_bank.count(sel["bank"], sel.get("category"), sel.get("tag")) if sel else 0
+        if not refs and not size:
+            return None
+        await store.set_deck(meeting_id, refs, size, random.getrandbits(32))
+        ref = await store.draw_question(meeting_id)
+    if isinstance(ref, int):
+        # a position in the bank selection, resolved through the id array every meeting shares
+        sel = sel or await store.get_bank(meeting_id)
+        qid = await question_bank.id_at(sel["bank"], sel.get("category"), sel.get("tag"), ref) if sel else None
+        return await question_bank.get(qid) if qid is not None else None
+    return await store.get_question(meeting_id, ref)
+
+@fastapi_app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+@fastapi_app.get("/debug/profile")
+async def get_profile():
+    # collapsed stacks; only populated when QUIZ_PROFILE_HZ is set
+    return PlainTextResponse(profiler.collapsed() if profiler else "")
+
+# --- Spectators ---
+# Read-only watchers get an SSE stream of whole-meeting snapshots instead of the
+# socket.io events: one snapshot per meeting, built and encoded at most
+# SPECTATOR_HZ times a second no matter how many are watching. With Redis, rounds
+# may be run by another worker, so watched meetings are polled instead.
+
+async def spectator_snapshot(meeting_id: str) -> Optional[dict]:
+    if not await store.has_meeting(meeting_id):
+        return None
+    cr = await store.get_round(meeting_id)
+    return {
+        "meeting_id": meeting_id,
+        "participants": await store.participant_count(meeting_id),
+        "round": cr and {
+            "round_id": cr["round_id"],
+            "question": cr["question"]["public"],
+            "mode": cr.get("mode", SINGLE),
+            "assigned_pid": cr.get("assigned_pid"),
+            "start_time": cr["start_time"],
+            "answered": cr.get("answered", False),
+        },
+        "top": await store.top(meeting_id, LEADERBOARD_TOP),
+    }
 
-async def broadcast_leaderboard(meeting_id: str):
-    m = meetings[meeting_id]
-    leaderboard = sorted([{"id": pid, "name": p["name"], "score": p["score"]} for pid,p in m["participants"].items()], key=lambda x: -x["score"])
-    await sio.emit("leaderboard", leaderboard, room=meeting_id)
+spectators = SpectatorHub(spectator_snapshot, poll=bool(os.environ.get("QUIZ_REDIS_URL")))
+
+@fastapi_app.get("/meetings/{meeting_id}/watch")
+async def watch_meeting(meeting_id: str):
+    if not await store.has_meeting(meeting_id):
+        raise HTTPException(404, "Meeting not found")
+    return StreamingResponse(spectators.watch(meeting_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def participant_entry(pid: str, p: dict) -> dict:
+    return {"id": pid, "name": p["name"], "score": p["score"], "is_moderator": p.get("is_moderator", False)}
+
+# helper: full participant list, only for newcomers and clients that saw a seq gap
+async def send_participants_snapshot(meeting_id: str, sid: str):
+    seq = await store.presence_seq(meeting_id)
+    participants = await store.get_participants(meeting_id)
+    lst = [participant_entry(pid, p) for pid,p in participants.items()]
+    await sio.emit("participants_snapshot", {"seq": seq, "participants": lst}, to=sid)
+
+# joins/leaves inside one coalescing window go out as a single numbered delta
+async def flush_participants(meeting_id: str, delta: dict):
+    delta["seq"] = await store.next_presence_seq(meeting_id)
+    await room_emit("participants_delta", delta, meeting_id)
+
+presence = PresenceCoalescer(flush_participants)
+
+async def broadcast_leaderboard(meeting_id: str, to: str = None):
+    # top-N snapshot only; everything else reaches clients as leaderboard_delta
+    leaderboard = await store.top(meeting_id, LEADERBOARD_TOP)
+    await sio.emit("leaderboard", leaderboard, to=to or meeting_id)
+
+async def broadcast_leaderboard_delta(meeting_id: str, pid: str, name: str, change):
+    score, old_rank, new_rank = change
+    delta = {"changes": [rank_change(pid, name, score, old_rank, new_rank)]}
+    if new_rank <= LEADERBOARD_TOP:
+        delta["top"] = await store.top(meeting_id, LEADERBOARD_TOP)
+    await room_emit("leaderboard_delta", delta, meeting_id)
+
+ROUND_SECONDS = 15
+
+# meeting_id -> pending round deadline (process-local; close_round arbitrates across workers)
+round_timers = {}
 
 # sid -> (meeting_id, participant_id)
+# process-local on purpose: a sid's events are always handled by the worker holding its connection
 sid_map = {}
 
+# sid -> InboundGuard (process-local like sid_map)
+guards = {}
+
+def guarded(handler):
+    # token bucket and payload shape are checked before the handler touches the store
+    @functools.wraps(handler)
+    async def wrapper(sid, data=None):
+        guard = guards.get(sid)
+        if guard is None or not guard.allow():
+            inbound_dropped.inc(1, "rate")
+            return
+        if data is not None and not isinstance(data, dict):
+            inbound_dropped.inc(1, "invalid")
+            return
+        return await handler(sid, data or {})
+    return wrapper
+
+async def send_error(sid: str, msg: str):
+    # one error_msg per NOTICE_INTERVAL, however fast the bad requests come in
+    guard = guards.get(sid)
+    if guard is None or guard.notice():
+        await sio.emit("error_msg", {"msg": msg}, to=sid)
+    else:
+        notices_suppressed.inc()
+
 @sio.event
 async def connect(sid, environ):
-    print("connect", sid)
+    guards[sid] = InboundGuard()
+    log.debug("connect %s", sid)
+
+# participant_id -> removal pending after a disconnect (process-local like sid_map)
+grace_timers = {}
 
 @sio.event
 async def disconnect(sid):
-    info = sid_map.get(sid)
+    info = sid_map.pop(sid, None)
+    guards.pop(sid, None)
+    log.debug("disconnect %s", sid)
     if not info:
         return
     meeting_id, pid = info
-    m = meetings.get(meeting_id)
-    if m and pid in m["participants"]:
-        del m["participants"][pid]
-        await broadcast_participants(meeting_id)
-    sid_map.pop(sid, None)
-    print("disconnect", sid)
+    # the seat is kept for RESUME_GRACE; a resume within it is invisible to the room
+    scheduler.cancel(grace_timers.pop(pid, None))
+    grace_timers[pid] = scheduler.call_later(RESUME_GRACE, expire_participant, meeting_id, pid, sid)
+    # no turns while away; unless the participant already resumed on a newer connection
+    me = await store.get_participant(meeting_id, pid)
+    if me and me["sid"] == sid:
+        await store.set_available(meeting_id, pid, False)
+
+async def expire_participant(meeting_id: str, pid: str, sid: str):
+    grace_timers.pop(pid, None)
+    me = await store.get_participant(meeting_id, pid)
+    # a resumed participant may already be bound to a newer connection
+    if me and me["sid"] == sid and await store.remove_participant(meeting_id, pid):
+        presence.removed(meeting_id, pid)
 
 @sio.on("join")
+@guarded
 async def on_join(sid, data):
     """
-    data: {meeting_id: str, name: str, is_moderator: bool}
+    data: {meeting_id: str, name: str, is_moderator: bool, resume_token?: str, last_seq?: int}
+    resume_token (from an earlier "joined") gets the same participant and score back,
+    after a reconnect or a server restart. Within the grace period the room sees
+    nothing, and the client gets only the room events after last_seq replayed.
     """
-    meeting_id = data.get("meeting_id") or "demo-room"
-    name = data.get("name") or "Anon"
-    is_mod = bool(data.get("is_moderator"))
-    ensure_meeting(meeting_id)
-    pid = str(uuid.uuid4())
-    meetings[meeting_id]["participants"][pid] = {"name": name, "sid": sid, "score": 0, "is_moderator": is_mod}
+    # ids and names are used as keys and interned: whatever the client sent, they are strings from here on
+    meeting_id = str(data.get("meeting_id") or "demo-room")
+    name = str(data.get("name") or "Anon")
+    if not await ensure_meeting(meeting_id):
+        await send_error(sid, "Sunucu dolu, daha sonra tekrar deneyin.")
+        return
+    token = data.get("resume_token")
+    resumed = await store.resume_participant(meeting_id, token, sid) if token else None
+    if resumed is None and await store.participant_count(meeting_id) >= MAX_PARTICIPANTS:
+        await send_error(sid, "Toplantı dolu.")
+        return
+    if resumed is not None:
+        pid, seated = resumed
+        scheduler.cancel(grace_timers.pop(pid, None))
+        if seated:
+            await store.set_available(meeting_id, pid, True)
+        participant = await store.get_participant(meeting_id, pid)
+    else:
+        pid, seated, token = str(uuid.uuid4()), False, secrets.token_urlsafe(16)
+        participant = {"name": name, "sid": sid, "score": 0,
+                       "is_moderator": bool(data.get("is_moderator")), "token": token}
+        await store.add_participant(meeting_id, pid, participant)
     sid_map[sid] = (meeting_id, pid)
     await sio.enter_room(sid, meeting_id)
-    await sio.emit("joined", {"participant_id": pid, "meeting_id": meeting_id}, to=sid)
-    await broadcast_participants(meeting_id)
-    print(f"{name} joined {meeting_id} as {pid}")
+    last_seq = data.get("last_seq")
+    if not isinstance(last_seq, int) or isinstance(last_seq, bool):
+        last_seq = None  # anything else gets the full snapshot, like a bad ?seq= in main.py
+    latest, missed = await store.events_since(meeting_id, last_seq if seated else None)
+    await sio.emit("joined", {"participant_id": pid, "meeting_id": meeting_id, "resume_token": token, "event_seq": latest}, to=sid)
+    if missed is not None:
+        for event, payload in missed:
+            await sio.emit(event, payload, to=sid)
+    else:
+        await broadcast_leaderboard(meeting_id, to=sid)
+        await send_participants_snapshot(meeting_id, sid)
+    if not seated:
+        presence.added(meeting_id, pid, participant_entry(pid, participant))
+    log.info("%s %s %s as %s", participant["name"], "resumed" if seated else "joined", meeting_id, pid)
+
+@sio.on("participants_sync")
+@guarded
+async def on_participants_sync(sid, data=None):
+    """
+    sent by a client whose participants_delta seq skipped ahead
+    """
+    info = sid_map.get(sid)
+    if info:
+        await send_participants_snapshot(info[0], sid)
 
 def calculate_points(elapsed_seconds: float, correct: bool) -> int:
-    if not correct:
-        return 0
-    if elapsed_seconds <= 5:
-        return 5
-    if elapsed_seconds <= 10:
-        return 3
-    if elapsed_seconds <= 15:
-        return 1
-    return 0
+    return points_for(elapsed_seconds, correct, ROUND_SECONDS)
 
 @sio.on("start_round")
+@guarded
 async def on_start_round(sid, data):
     """
-    data: {meeting_id: str}
+    data: {meeting_id: str, mode?: "single" | "all"}
     only moderator should call this ideally (we check)
+    mode "all": everyone answers within ROUND_SECONDS, scored together when it closes
+    if rounds were planned (plan_rounds) the next one is used and mode is ignored
     """
     info = sid_map.get(sid)
     if not info:
         return
     meeting_id, pid = info
-    m = meetings.get(meeting_id)
-    if not m:
+    if not await store.has_meeting(meeting_id):
         return
+    await store.touch(meeting_id)  # rounds keep a meeting alive; joins and new questions do too
     # check moderator
-    if not m["participants"].get(pid, {}).get("is_moderator"):
-        await sio.emit("error_msg", {"msg": "Sadece moderator round başlatabilir."}, to=sid)
-        return
-    if not m["questions"]:
-        await sio.emit("error_msg", {"msg": "Toplantıda soru yok."}, to=sid)
+    me = await store.get_participant(meeting_id, pid)
+    if not (me or {}).get("is_moderator"):
+        await send_error(sid, "Sadece moderator round başlatabilir.")
         return
-
-    question = random.choice(m["questions"])
-    assigned_pid = random.choice(list(m["participants"].keys()))
+    # a pre-planned round (plan_rounds) comes first; otherwise draw one now
+    planned = await store.next_planned(meeting_id)
+    if planned:
+        question, mode = planned["question"], planned["mode"]
+    else:
+        question = await draw_question(meeting_id)
+        if not question:
+            await send_error(sid, "Toplantıda soru yok.")
+            return
+        mode = ALL if data.get("mode") == ALL else SINGLE
+    # fair rotation: everyone answers once before anyone answers twice, O(1) per pick
+    assigned_pid = await store.next_answerer(meeting_id) if mode == SINGLE else None
     round_id = str(uuid.uuid4())
     start_time = time.time()
-    m["current_round"] = {
+    await store.set_round(meeting_id, {
         "round_id": round_id,
         "question": question,
+        "mode": mode,
         "assigned_pid": assigned_pid,
         "start_time": start_time,
         "answered": False
-    }
-    await sio.emit("start_round", {
+    })
+    await room_emit("start_round", {
         "round_id": round_id,
-        "question": {"id": question["id"], "text": question["text"], "choices": question["choices"]},
+        "question": question["public"],
+        "mode": mode,
         "assigned_pid": assigned_pid,
         "start_time": start_time
-    }, room=meeting_id)
+    }, meeting_id)
 
-    # timeout
-    async def round_timeout_checker(mid, rid):
-        await asyncio.sleep(15)
-        m2 = meetings.get(mid)
-        if not m2:
-            return
-        cr = m2.get("current_round")
-        if not cr or cr.get("round_id") != rid:
+    # timeout; replaces any deadline left over from the previous round
+    scheduler.cancel(round_timers.get(meeting_id))
+    round_timers[meeting_id] = scheduler.call_later(ROUND_SECONDS, round_timeout, meeting_id, round_id)
+
+MAX_PLANNED_ROUNDS = 100
+
+@sio.on("plan_rounds")
+@guarded
+async def on_plan_rounds(sid, data):
+    """
+    data: {rounds: int, mode?: "single" | "all" | one of those per round}
+    moderator only; draws the questions for the next `rounds` start_round calls
+    up front (0 clears the plan). The moderator gets {"rounds": n} back.
+    """
+    info = sid_map.get(sid)
+    if not info:
+        return
+    meeting_id, pid = info
+    me = await store.get_participant(meeting_id, pid)
+    if not (me or {}).get("is_moderator"):
+        await send_error(sid, "Sadece moderator round planlayabilir.")
+        return
+    count, modes = data.get("rounds"), data.get("mode")
+    if not isinstance(count, int) or not 0 <= count <= MAX_PLANNED_ROUNDS:
+        await send_error(sid, f"Round sayısı 0-{MAX_PLANNED_ROUNDS} arasında olmalı.")
+        return
+    if not isinstance(modes, list):
+        modes = [modes] * count
+    rounds = []
+    for i in range(count):
+        question = await draw_question(meeting_id)
+        if not question:
+            await send_error(sid, "Toplantıda soru yok.")
             return
-        if not cr.get("answered"):
-            cr["answered"] = True
-            await sio.emit("round_result", {"round_id": rid, "correct": False, "points_awarded": 0, "elapsed": None, "by": None}, room=mid)
-            await broadcast_leaderboard(mid)
+        rounds.append({"question": question, "mode": ALL if i < len(modes) and modes[i] == ALL else SINGLE})
+    await store.set_plan(meeting_id, rounds)
+    await sio.emit("rounds_planned", {"rounds": await store.planned_count(meeting_id)}, to=sid)
 
-    asyncio.create_task(round_timeout_checker(meeting_id, round_id))
+async def round_timeout(mid: str, rid: str):
+    round_timers.pop(mid, None)
+    # close_round is atomic across workers, so an answer that won the race suppresses the timeout
+    if not await store.close_round(mid, rid):
+        return
+    cr = await store.get_round(mid)
+    if cr and cr.get("mode") == ALL:
+        await score_everyone(mid, cr)
+    else:
+        await room_emit("round_result", {"round_id": rid, "correct": False, "points_awarded": 0, "elapsed": None, "by": None}, mid)
+
+async def score_everyone(mid: str, cr: dict):
+    # the whole window's answers are scored in one pass and applied as one batch;
+    # the room gets one round_result carrying the new top-N instead of a delta per answer
+    answers = await store.take_answers(mid, cr["round_id"])
+    correct_index = cr["question"]["correct_index"]
+    awards = score_answers(answers, correct_index, ROUND_SECONDS)
+    if awards:
+        await store.add_scores(mid, awards)
+    await room_emit("round_result", {
+        "round_id": cr["round_id"],
+        "mode": ALL,
+        "correct_index": correct_index,
+        "answers": len(answers),
+        "correct_count": len(awards),
+        "top": await store.top(mid, LEADERBOARD_TOP)
+    }, mid)
+
+async def resume_round_timers():
+    # deadlines are process-local; rounds recovered from the journal get theirs back
+    now = time.time()
+    for mid in list(store.meetings):
+        cr = await store.get_round(mid)
+        if cr and not cr.get("answered"):
+            delay = max(0.0, cr["start_time"] + ROUND_SECONDS - now)
+            round_timers[mid] = scheduler.call_later(delay, round_timeout, mid, cr["round_id"])
 
 @sio.on("answer")
+@guarded
 async def on_answer(sid, data):
     """
     data: {round_id: str, selected_index: int}
     """
+    received = time.perf_counter()
     info = sid_map.get(sid)
     if not info:
         return
     meeting_id, pid = info
-    m = meetings.get(meeting_id)
-    if not m:
+    if not isinstance(data.get("round_id"), str) or not isinstance(data.get("selected_index"), int):
+        inbound_dropped.inc(1, "invalid")
+        await send_error(sid, "Geçersiz cevap.")
         return
-    cr = m.get("current_round")
+    cr = await store.get_round(meeting_id)
     if not cr or cr.get("round_id") != data.get("round_id"):
-        await sio.emit("error_msg", {"msg": "Aktif round yok veya yanlış round_id"}, to=sid)
+        await send_error(sid, "Aktif round yok veya yanlış round_id")
+        return
+    if cr.get("mode") == ALL:
+        await buffer_answer(sid, meeting_id, pid, cr, data["selected_index"])
         return
     if pid != cr["assigned_pid"]:
-        await sio.emit("error_msg", {"msg": "Bu round için sana cevap yetkisi yok."}, to=sid)
+        await send_error(sid, "Bu round için sana cevap yetkisi yok.")
         return
     if cr.get("answered"):
-        await sio.emit("error_msg", {"msg": "Round zaten cevaplandı."}, to=sid)
+        await send_error(sid, "Round zaten cevaplandı.")
         return
 
     elapsed = time.time() - cr["start_time"]
     correct = (data.get("selected_index") == cr["question"]["correct_index"])
     points = calculate_points(elapsed, correct)
 
-    cr["answered"] = True
-    cr["answered_by"] = pid
-    cr["answered_correct"] = correct
-    cr["elapsed"] = elapsed
+    if not await store.close_round(meeting_id, cr["round_id"], answered_by=pid, answered_correct=correct, elapsed=elapsed):
+        await send_error(sid, "Round zaten cevaplandı.")
+        return
+    scheduler.cancel(round_timers.pop(meeting_id, None))
 
+    change = None
     if correct:
-        m["participants"][pid]["score"] += points
+        change = await store.add_score(meeting_id, pid, points)
 
-    await sio.emit("round_result", {
+    await room_emit("round_result", {
         "round_id": cr["round_id"],
         "correct": correct,
         "points_awarded": points,
         "elapsed": elapsed,
         "by": pid,
         "correct_index": cr["question"]["correct_index"]
-    }, room=meeting_id)
+    }, meeting_id)
+    answer_latency.observe(time.perf_counter() - received)
+
+    if change and points:
+        me = await store.get_participant(meeting_id, pid)
+        if me:
+            await broadcast_leaderboard_delta(meeting_id, pid, me["name"], change)
+
+async def buffer_answer(sid: str, meeting_id: str, pid: str, cr: dict, choice: int):
+    # nothing goes to the room here; round_timeout scores the buffer when the window closes
+    elapsed = time.time() - cr["start_time"]
+    if cr.get("answered") or elapsed > ROUND_SECONDS:
+        await send_error(sid, "Cevap süresi doldu.")
+        return
+    if not 0 <= choice < len(cr["question"]["choices"]):
+        await send_error(sid, "Geçersiz cevap.")
+        return
+    if not await store.record_answer(meeting_id, cr["round_id"], pid, choice, elapsed):
+        await send_error(sid, "Bu round için zaten cevap verdin.")
+        return
+    await sio.emit("answer_received", {"round_id": cr["round_id"]}, to=sid)
+
+# static files (index.html), precompressed in memory; registered last so the API routes above are not shadowed
+assets = StaticAssets("static")
 
-    await broadcast_leaderboard(meeting_id)
\ No newline at end of file
+@fastapi_app.api_route("/{path:path}", methods=["GET", "HEAD"])
+async def get_static(request: Request, path: str):
+    return assets.response(request, path)
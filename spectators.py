@@ -0,0 +1,96 @@
+import time
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+from timers import scheduler, Timer
+import wire
+
+SPECTATOR_HZ = 4.0  # snapshot pushes per second per room, at most
+KEEPALIVE = 15.0  # seconds between SSE comments on a quiet room, so proxies keep the stream open
+
+
+class RoomFeed:
+    __slots__ = ("version", "snapshot", "frame", "changed", "watchers", "last", "timer")
+
+    def __init__(self):
+        self.version = 0
+        self.snapshot: Optional[dict] = None
+        self.frame: Optional[bytes] = None  # the latest snapshot as a ready-to-send SSE event
+        self.changed = asyncio.Event()  # set (and replaced) each time a new frame lands
+        self.watchers = 0
+        self.last = float("-inf")
+        self.timer: Optional[Timer] = None
+
+
+class SpectatorHub:
+    """Read-only room snapshots for spectators, separate from the player fan-out.
+
+    Room events only mark() the room; at most `hz` times a second one snapshot
+    is built with `build(room)`, encoded once into an SSE frame, and every
+    watcher is woken to send those same bytes. A slow watcher skips to the
+    latest frame instead of queueing old ones, and rooms nobody watches cost
+    a dict lookup per event. With `poll` (state shared between workers, so
+    events may happen elsewhere) watched rooms are rebuilt every interval and
+    only an actually changed snapshot is sent.
+    """
+
+    def __init__(self, build: Callable[[str], Awaitable[Optional[dict]]], hz: float = SPECTATOR_HZ,
+                 poll: bool = False):
+        self.build = build
+        self.interval = 1.0 / hz
+        self.poll = poll
+        self.rooms: Dict[str, RoomFeed] = {}
+
+    @property
+    def watchers(self) -> int:
+        return sum(feed.watchers for feed in self.rooms.values())
+
+    def mark(self, room: str):
+        feed = self.rooms.get(room)
+        if feed is None or feed.timer is not None:
+            return
+        delay = max(0.0, feed.last + self.interval - time.monotonic())
+        feed.timer = scheduler.call_later(delay, self._publish, room, feed)
+
+    async def _publish(self, room: str, feed: RoomFeed):
+        # cleared before building: an event during the build schedules the next push
+        feed.timer = None
+        snapshot = await self.build(room)
+        feed.last = time.monotonic()
+        if feed.watchers == 0 or self.rooms.get(room) is not feed:
+            return
+        if self.poll:
+            self.mark(room)
+        data = {"closed": True} if snapshot is None else snapshot
+        if data == feed.snapshot:
+            return
+        feed.version += 1
+        feed.snapshot = data
+        feed.frame = f"id: {feed.version}\ndata: {wire.dumps(data)}\n\n".encode()
+        changed, feed.changed = feed.changed, asyncio.Event()
+        changed.set()
+
+    async def watch(self, room: str) -> AsyncIterator[bytes]:
+        """SSE frames for one watcher: the current snapshot, then each newer one."""
+        feed = self.rooms.get(room)
+        if feed is None:
+            feed = self.rooms[room] = RoomFeed()
+        feed.watchers += 1
+        if feed.frame is None:
+            self.mark(room)
+        seen = 0
+        try:
+            yield f"retry: {int(KEEPALIVE * 1000)}\n\n".encode()
+            while True:
+                if feed.version != seen and feed.frame is not None:
+                    seen = feed.version
+                    yield feed.frame
+                changed = feed.changed
+                try:
+                    await asyncio.wait_for(changed.wait(), KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            feed.watchers -= 1
+            if feed.watchers == 0 and self.rooms.get(room) is feed:
+                scheduler.cancel(feed.timer)
+                del self.rooms[room]
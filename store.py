@@ -0,0 +1,785 @@
+import os
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+from leaderboard import Leaderboard, LEADERBOARD_TOP
+from participants import ParticipantTable
+from journal import open_journal
+from resume import EventRing, RING_SIZE
+from scoring import AnswerBuffer
+from rotation import new_rotation
+from questionbank import deck_entry, shuffled_position
+
+
+# --- Meeting state backends ---
+# Every piece of meeting state server.py needs across workers goes through one
+# of these. MemoryStore is the single-process default; RedisStore keeps the same
+# state in Redis so several uvicorn workers/nodes can serve one meeting.
+
+class MemoryStore:
+    def __init__(self):
+        # meeting_id -> {participants: ParticipantTable, questions: {qid: {...}}, current_round: {...}, ...},
+        # least recently active first (see touch)
+        self.meetings = OrderedDict()
+
+    async def ensure_meeting(self, mid: str):
+        if mid not in self.meetings:
+            self.meetings[mid] = {"active": time.monotonic(), "participants": ParticipantTable(), "questions": {}, "current_round": None, "leaderboard": Leaderboard(),
+                                  "presence_seq": 0, "bank": None, "deck": None, "tokens": {}, "departed": {},
+                                  "events": EventRing(), "answers": None, "rotation": new_rotation(mid), "plan": []}
+
+    async def has_meeting(self, mid: str) -> bool:
+        return mid in self.meetings
+
+    # --- lifecycle ---
+
+    async def touch(self, mid: str):
+        m = self.meetings.get(mid)
+        if m:
+            m["active"] = time.monotonic()
+            self.meetings.move_to_end(mid)
+
+    async def meeting_count(self) -> int:
+        return len(self.meetings)
+
+    async def participant_count(self, mid: str) -> int:
+        m = self.meetings.get(mid)
+        return len(m["participants"]) if m else 0
+
+    async def question_count(self, mid: str) -> int:
+        m = self.meetings.get(mid)
+        return len(m["questions"]) if m else 0
+
+    async def drop_meeting(self, mid: str):
+        self.meetings.pop(mid, None)
+
+    async def evict_idle(self, ttl: float) -> List[str]:
+        """Drops meetings with nobody in them and no activity for `ttl` seconds."""
+        cutoff = time.monotonic() - ttl
+        evicted = []
+        for mid, m in list(self.meetings.items()):
+            if m["active"] > cutoff:
+                break  # the rest were touched more recently
+            if not len(m["participants"]):
+                await self.drop_meeting(mid)
+                evicted.append(mid)
+        return evicted
+
+    async def evict_lru(self) -> Optional[str]:
+        """Drops the least recently active empty meeting to make room for a new one."""
+        for mid, m in self.meetings.items():
+            if not len(m["participants"]):
+                await self.drop_meeting(mid)
+                return mid
+        return None
+
+    async def add_question(self, mid: str, question: dict):
+        self.meetings[mid]["questions"][question["id"]] = question
+
+    async def get_question(self, mid: str, qid: str) -> Optional[dict]:
+        m = self.meetings.get(mid)
+        return m["questions"].get(qid) if m else None
+
+    async def question_ids(self, mid: str) -> List[str]:
+        m = self.meetings.get(mid)
+        return list(m["questions"]) if m else []
+
+    async def set_bank(self, mid: str, selection: Optional[dict]):
+        self.meetings[mid]["bank"] = selection
+
+    async def get_bank(self, mid: str) -> Optional[dict]:
+        m = self.meetings.get(mid)
+        return m["bank"] if m else None
+
+    async def set_deck(self, mid: str, refs: List[str] = (), bank_size: int = 0, seed: int = 0):
+        """A new game order over the ad-hoc question ids `refs` and `bank_size` bank positions.
+
+        Only the ids, the size and the seed are kept (see questionbank.deck_entry);
+        the default, an empty deck, makes the next draw build a fresh one.
+        """
+        self.meetings[mid]["deck"] = {"refs": list(refs), "bank": bank_size, "seed": seed, "pos": 0}
+
+    async def draw_question(self, mid: str) -> Union[str, int, None]:
+        """An ad-hoc question id (str), a position in the meeting's bank selection (int), or None when used up."""
+        m = self.meetings.get(mid)
+        deck = m["deck"] if m else None
+        if not deck:
+            return None
+        ref = deck_entry(deck["refs"], deck["bank"], deck["seed"], deck["pos"])
+        if ref is not None:
+            deck["pos"] += 1
+        return ref
+
+    async def set_plan(self, mid: str, rounds: List[dict]):
+        """Queues pre-planned rounds ({question, mode}), replacing any left over."""
+        self.meetings[mid]["plan"] = rounds[::-1]  # popped from the end, like the deck
+
+    async def next_planned(self, mid: str) -> Optional[dict]:
+        m = self.meetings.get(mid)
+        return m["plan"].pop() if m and m["plan"] else None
+
+    async def planned_count(self, mid: str) -> int:
+        m = self.meetings.get(mid)
+        return len(m["plan"]) if m else 0
+
+    async def add_participant(self, mid: str, pid: str, participant: dict):
+        m = self.meetings[mid]
+        m["participants"].add(pid, participant["name"], participant["sid"], participant.get("is_moderator", False), participant.get("token"))
+        m["leaderboard"].add(pid, participant["name"], participant.get("score", 0))
+        m["rotation"].add(pid)
+        if participant.get("token"):
+            m["tokens"][participant["token"]] = pid
+
+    async def remove_participant(self, mid: str, pid: str) -> bool:
+        m = self.meetings.get(mid)
+        p = m["participants"].remove(pid) if m else None
+        if p is None:
+            return False
+        score = m["leaderboard"].remove(pid)
+        m["rotation"].remove(pid)
+        if p.token:
+            # kept so the same client can come back (reconnect, or after a restart) with its score
+            m["departed"][pid] = {"name": p.name, "is_moderator": p.is_moderator, "score": score, "token": p.token}
+        return True
+
+    async def resume_participant(self, mid: str, token: str, sid: str) -> Optional[Tuple[str, bool]]:
+        """Re-attaches the participant holding `token` to `sid`.
+
+        Returns (pid, True) if it was still in the meeting (within its grace
+        period), (pid, False) if it had left and was added back, or None.
+        """
+        m = self.meetings.get(mid)
+        pid = m["tokens"].get(token) if m else None
+        if pid is None:
+            return None
+        p = m["participants"].get(pid)
+        if p is not None:
+            m["participants"].rebind(pid, sid)
+            return pid, True
+        gone = m["departed"].pop(pid, None)
+        if gone is None:
+            return None
+        await MemoryStore.add_participant(self, mid, pid, dict(gone, sid=sid))
+        return pid, False
+
+    async def get_participant(self, mid: str, pid: str) -> Optional[dict]:
+        m = self.meetings.get(mid)
+        p = m["participants"].get(pid) if m else None
+        return p.as_dict(m["leaderboard"].score(pid)) if p else None
+
+    async def get_participants(self, mid: str) -> Dict[str, dict]:
+        m = self.meetings.get(mid)
+        if not m:
+            return {}
+        lb = m["leaderboard"]
+        return {p.pid: p.as_dict(lb.score(p.pid)) for p in m["participants"]}
+
+    async def next_answerer(self, mid: str) -> Optional[str]:
+        """Next pid in the meeting's answerer rotation (see rotation.Rotation)."""
+        m = self.meetings.get(mid)
+        return m["rotation"].next() if m else None
+
+    async def set_available(self, mid: str, pid: str, available: bool):
+        """Takes a disconnected participant out of the rotation while it keeps its seat, or puts it back."""
+        m = self.meetings.get(mid)
+        if not m:
+            return
+        if not available:
+            m["rotation"].remove(pid)
+        elif pid in m["participants"]:
+            m["rotation"].add(pid)
+
+    async def add_score(self, mid: str, pid: str, points: int) -> Optional[Tuple[int, int, int]]:
+        """Returns (new score, old rank, new rank), or None if the participant is gone."""
+        m = self.meetings[mid]
+        if pid not in m["participants"]:
+            return None
+        return m["leaderboard"].add_score(pid, points)
+
+    async def add_scores(self, mid: str, awards: Dict[str, int]):
+        """Batch of score increments (an "everyone answers" round); participants gone by now are skipped."""
+        m = self.meetings[mid]
+        lb = m["leaderboard"]
+        for pid, points in awards.items():
+            if pid in m["participants"]:
+                lb.add_score(pid, points)
+
+    async def top(self, mid: str, k: int = LEADERBOARD_TOP) -> List[dict]:
+        m = self.meetings.get(mid)
+        return m["leaderboard"].top(k) if m else []
+
+    async def next_presence_seq(self, mid: str) -> int:
+        m = self.meetings.get(mid)
+        if not m:
+            return 0  # evicted meanwhile; there is nobody left to number it for
+        m["presence_seq"] += 1
+        return m["presence_seq"]
+
+    async def presence_seq(self, mid: str) -> int:
+        m = self.meetings.get(mid)
+        return m["presence_seq"] if m else 0
+
+    async def push_event(self, mid: str, event: str, data) -> int:
+        m = self.meetings.get(mid)
+        return m["events"].push((event, data)) if m else 0
+
+    async def events_since(self, mid: str, seq: Optional[int]) -> Tuple[int, Optional[list]]:
+        """(latest event seq, [(event, data), ...] after `seq`, or None if a snapshot is needed)."""
+        m = self.meetings.get(mid)
+        if not m:
+            return 0, None
+        ring = m["events"]
+        return ring.seq, ring.since(seq) if seq is not None else None
+
+    async def set_round(self, mid: str, rnd: dict):
+        self.meetings[mid]["current_round"] = rnd
+
+    async def get_round(self, mid: str) -> Optional[dict]:
+        m = self.meetings.get(mid)
+        return m["current_round"] if m else None
+
+    async def record_answer(self, mid: str, round_id: str, pid: str, choice: int, elapsed: float) -> bool:
+        """Buffers an "everyone answers" answer; False if this participant already answered."""
+        m = self.meetings[mid]
+        if m["answers"] is None or m["answers"][0] != round_id:
+            m["answers"] = (round_id, AnswerBuffer())
+        return m["answers"][1].add(pid, choice, elapsed)
+
+    async def take_answers(self, mid: str, round_id: str) -> AnswerBuffer:
+        m = self.meetings.get(mid)
+        if m and m["answers"] and m["answers"][0] == round_id:
+            buffer = m["answers"][1]
+            m["answers"] = None
+            return buffer
+        return AnswerBuffer()
+
+    async def close_round(self, mid: str, round_id: str, **result) -> bool:
+        """Mark the round answered; only the first caller (answer or timeout) gets True."""
+        cr = await self.get_round(mid)
+        if not cr or cr.get("round_id") != round_id or cr.get("answered"):
+            return False
+        cr["answered"] = True
+        cr.update(result)
+        return True
+
+
+class JournaledStore(MemoryStore):
+    """MemoryStore whose mutations are also appended to a Journal.
+
+    Handlers only pay for building a small dict and a queue put; the journal's
+    writer thread does the encoding and fsync. On startup restore() rebuilds
+    the meetings from the last snapshot plus the log after it. Connections do
+    not survive a restart, so everyone comes back as departed and rejoins with
+    their resume token (see resume_participant).
+    """
+
+    def __init__(self, journal):
+        super().__init__()
+        self.journal = journal
+
+    async def ensure_meeting(self, mid: str):
+        if mid not in self.meetings:
+            await super().ensure_meeting(mid)
+            self.journal.append({"e": "meeting", "m": mid})
+
+    async def drop_meeting(self, mid: str):
+        if mid in self.meetings:
+            await super().drop_meeting(mid)
+            self.journal.append({"e": "drop", "m": mid})
+
+    async def add_question(self, mid: str, question: dict):
+        await super().add_question(mid, question)
+        self.journal.append({"e": "question", "m": mid, "q": question})
+
+    async def set_bank(self, mid: str, selection: Optional[dict]):
+        await super().set_bank(mid, selection)
+        self.journal.append({"e": "bank", "m": mid, "bank": selection})
+
+    async def set_deck(self, mid: str, refs: List[str] = (), bank_size: int = 0, seed: int = 0):
+        await super().set_deck(mid, refs, bank_size, seed)
+        # the ad-hoc ids (at most MAX_QUESTIONS) plus the bank's size and seed; never the bank order
+        self.journal.append({"e": "deck", "m": mid, "refs": list(refs), "bank": bank_size, "seed": seed})
+
+    async def draw_question(self, mid: str) -> Union[str, int, None]:
+        ref = await super().draw_question(mid)
+        if ref is not None:
+            self.journal.append({"e": "draw", "m": mid})
+        return ref
+
+    async def set_plan(self, mid: str, rounds: List[dict]):
+        await super().set_plan(mid, rounds)
+        self.journal.append({"e": "plan", "m": mid, "rounds": list(rounds)})
+
+    async def next_planned(self, mid: str) -> Optional[dict]:
+        planned = await super().next_planned(mid)
+        if planned is not None:
+            self.journal.append({"e": "planned", "m": mid})
+        return planned
+
+    async def add_participant(self, mid: str, pid: str, participant: dict):
+        await super().add_participant(mid, pid, participant)
+        self.journal.append({"e": "join", "m": mid, "pid": pid, "p": _durable(participant)})
+
+    async def remove_participant(self, mid: str, pid: str) -> bool:
+        removed = await super().remove_participant(mid, pid)
+        if removed:
+            self.journal.append({"e": "leave", "m": mid, "pid": pid})
+        return removed
+
+    async def resume_participant(self, mid: str, token: str, sid: str) -> Optional[Tuple[str, bool]]:
+        resumed = await super().resume_participant(mid, token, sid)
+        if resumed is not None:
+            self.journal.append({"e": "resume", "m": mid, "token": token})
+        return resumed
+
+    async def add_score(self, mid: str, pid: str, points: int) -> Optional[Tuple[int, int, int]]:
+        change = await super().add_score(mid, pid, points)
+        if change is not None:
+            self.journal.append({"e": "score", "m": mid, "pid": pid, "points": points})
+        return change
+
+    async def add_scores(self, mid: str, awards: Dict[str, int]):
+        await super().add_scores(mid, awards)
+        self.journal.append({"e": "scores", "m": mid, "awards": dict(awards)})
+
+    async def set_round(self, mid: str, rnd: dict):
+        await super().set_round(mid, rnd)
+        self.journal.append({"e": "round", "m": mid, "round": dict(rnd)})  # close_round updates it in place
+
+    async def close_round(self, mid: str, round_id: str, **result) -> bool:
+        closed = await super().close_round(mid, round_id, **result)
+        if closed:
+            self.journal.append({"e": "closed", "m": mid, "round_id": round_id, "result": result})
+        return closed
+
+    # --- snapshot / recovery ---
+
+    def export(self) -> dict:
+        """Plain copies of every meeting; runs on the loop, encoded off it by the journal."""
+        out = {}
+        for mid, m in self.meetings.items():
+            lb = m["leaderboard"]
+            participants = {p.pid: {"name": p.name, "is_moderator": p.is_moderator, "score": lb.score(p.pid), "token": p.token}
+                            for p in m["participants"]}
+            out[mid] = {"questions": dict(m["questions"]), "bank": m["bank"], "deck": dict(m["deck"]) if m["deck"] else None, "plan": list(m["plan"]),
+                        "round": dict(m["current_round"]) if m["current_round"] else None,
+                        "presence_seq": m["presence_seq"], "participants": participants, "departed": dict(m["departed"])}
+        return out
+
+    async def restore(self):
+        state, events = self.journal.recover()
+        for mid, saved in (state or {}).items():
+            await MemoryStore.ensure_meeting(self, mid)
+            m = self.meetings[mid]
+            m.update(questions=saved["questions"], bank=saved["bank"], deck=saved["deck"], plan=saved.get("plan", []),
+                     current_round=saved["round"], presence_seq=saved["presence_seq"], departed=saved["departed"])
+            m["tokens"] = {d["token"]: pid for pid, d in saved["departed"].items()}
+            for pid, p in saved["participants"].items():
+                await MemoryStore.add_participant(self, mid, pid, dict(p, sid=""))
+        for event in events:
+            await self._apply(event)
+        # the connections behind recovered participants died with the old process
+        for mid, m in self.meetings.items():
+            for pid in m["participants"].pids():
+                await MemoryStore.remove_participant(self, mid, pid)
+
+    async def _apply(self, event: dict):
+        # replays through MemoryStore directly so nothing is journaled twice
+        kind, mid = event["e"], event["m"]
+        if kind == "meeting":
+            await MemoryStore.ensure_meeting(self, mid)
+        elif kind == "drop":
+            await MemoryStore.drop_meeting(self, mid)
+        elif kind == "question":
+            await MemoryStore.add_question(self, mid, event["q"])
+        elif kind == "bank":
+            await MemoryStore.set_bank(self, mid, event["bank"])
+        elif kind == "deck":
+            await MemoryStore.set_deck(self, mid, event["refs"], event["bank"], event["seed"])
+        elif kind == "draw":
+            await MemoryStore.draw_question(self, mid)
+        elif kind == "plan":
+            await MemoryStore.set_plan(self, mid, event["rounds"])
+        elif kind == "planned":
+            await MemoryStore.next_planned(self, mid)
+        elif kind == "join":
+            await MemoryStore.add_participant(self, mid, event["pid"], dict(event["p"], sid=""))
+        elif kind == "leave":
+            await MemoryStore.remove_participant(self, mid, event["pid"])
+        elif kind == "resume":
+            await MemoryStore.resume_participant(self, mid, event["token"], "")
+        elif kind == "score":
+            await MemoryStore.add_score(self, mid, event["pid"], event["points"])
+        elif kind == "scores":
+            await MemoryStore.add_scores(self, mid, event["awards"])
+        elif kind == "round":
+            await MemoryStore.set_round(self, mid, event["round"])
+        elif kind == "closed":
+            await MemoryStore.close_round(self, mid, event["round_id"], **event["result"])
+
+
+def _durable(participant: dict) -> dict:
+    # sids are per-connection and meaningless after a restart
+    return {k: v for k, v in participant.items() if k != "sid"}
+
+
+class RedisStore:
+    """Same interface as MemoryStore, backed by any redis.asyncio-compatible client."""
+
+    ROUND_TTL = 3600
+
+    def __init__(self, client, prefix: str = "quiz"):
+        self.r = client
+        self.prefix = prefix
+
+    def _key(self, mid: str, part: str) -> str:
+        return f"{self.prefix}:m:{mid}:{part}"
+
+    async def ensure_meeting(self, mid: str):
+        if await self.r.sadd(f"{self.prefix}:meetings", mid):
+            await self.touch(mid)
+
+    async def has_meeting(self, mid: str) -> bool:
+        return bool(await self.r.sismember(f"{self.prefix}:meetings", mid))
+
+    # Last activity lives in one sorted set (unix time), shared by every worker's sweeper.
+    # Per-round keys (closed:*, answers:*) are left to their own TTLs.
+    MEETING_KEYS = ("p", "lb", "seq", "q", "bank", "deck", "pseq", "round", "tok", "gone", "events", "eseq", "rot", "away", "plan", "dmeta")
+
+    async def touch(self, mid: str):
+        await self.r.zadd(f"{self.prefix}:active", {mid: time.time()})
+
+    async def meeting_count(self) -> int:
+        return int(await self.r.scard(f"{self.prefix}:meetings"))
+
+    async def participant_count(self, mid: str) -> int:
+        return int(await self.r.hlen(self._key(mid, "p")))
+
+    async def question_count(self, mid: str) -> int:
+        return int(await self.r.hlen(self._key(mid, "q")))
+
+    async def drop_meeting(self, mid: str):
+        pipe = self.r.pipeline(transaction=True)
+        pipe.srem(f"{self.prefix}:meetings", mid)
+        pipe.zrem(f"{self.prefix}:active", mid)
+        pipe.delete(*(self._key(mid, part) for part in self.MEETING_KEYS))
+        await pipe.execute()
+
+    async def evict_idle(self, ttl: float) -> List[str]:
+        idle = await self.r.zrangebyscore(f"{self.prefix}:active", "-inf", time.time() - ttl)
+        return [mid for mid in map(_text, idle) if await self._evict_if_empty(mid)]
+
+    async def evict_lru(self) -> Optional[str]:
+        for mid in map(_text, await self.r.zrange(f"{self.prefix}:active", 0, 99)):
+            if await self._evict_if_empty(mid):
+                return mid
+        return None
+
+    async def _evict_if_empty(self, mid: str) -> bool:
+        if await self.participant_count(mid):
+            return False
+        await self.drop_meeting(mid)
+        return True
+
+    async def add_question(self, mid: str, question: dict):
+        await self.r.hset(self._key(mid, "q"), question["id"], json.dumps(question))
+
+    async def get_question(self, mid: str, qid: str) -> Optional[dict]:
+        raw = await self.r.hget(self._key(mid, "q"), qid)
+        return json.loads(raw) if raw is not None else None
+
+    async def question_ids(self, mid: str) -> List[str]:
+        return [_text(qid) for qid in await self.r.hkeys(self._key(mid, "q"))]
+
+    async def set_bank(self, mid: str, selection: Optional[dict]):
+        await self.r.set(self._key(mid, "bank"), json.dumps(selection))
+
+    async def get_bank(self, mid: str) -> Optional[dict]:
+        raw = await self.r.get(self._key(mid, "bank"))
+        return json.loads(raw) if raw is not None else None
+
+    # The deck is the ad-hoc ids in "deck" plus {bank, seed, pos} in "dmeta"; HINCRBY
+    # hands every draw its own position, so workers never draw the same question.
+
+    async def set_deck(self, mid: str, refs: List[str] = (), bank_size: int = 0, seed: int = 0):
+        key = self._key(mid, "deck")
+        pipe = self.r.pipeline(transaction=True)
+        pipe.delete(key)
+        for i in range(0, len(refs), 1000):
+            pipe.rpush(key, *refs[i:i + 1000])
+        pipe.hset(self._key(mid, "dmeta"), mapping={"n": len(refs), "bank": bank_size, "seed": seed, "pos": 0})
+        await pipe.execute()
+
+    async def draw_question(self, mid: str) -> Union[str, int, None]:
+        pipe = self.r.pipeline(transaction=True)
+        pipe.hincrby(self._key(mid, "dmeta"), "pos", 1)
+        pipe.hmget(self._key(mid, "dmeta"), "n", "bank", "seed")
+        pos, (n, bank, seed) = await pipe.execute()
+        if n is None:
+            return None
+        n, total = int(n), int(n) + int(bank)
+        if pos > total:
+            return None
+        position = shuffled_position(pos - 1, total, int(seed))
+        if position >= n:
+            return position - n
+        ref = await self.r.lindex(self._key(mid, "deck"), position)
+        return _text(ref) if ref is not None else None
+
+    async def set_plan(self, mid: str, rounds: List[dict]):
+        key = self._key(mid, "plan")
+        pipe = self.r.pipeline(transaction=True)
+        pipe.delete(key)
+        if rounds:
+            pipe.rpush(key, *(json.dumps(r) for r in rounds))
+        await pipe.execute()
+
+    async def next_planned(self, mid: str) -> Optional[dict]:
+        raw = await self.r.lpop(self._key(mid, "plan"))
+        return json.loads(raw) if raw is not None else None
+
+    async def planned_count(self, mid: str) -> int:
+        return int(await self.r.llen(self._key(mid, "plan")))
+
+    # Scores live in a sorted set holding -score, with members "<join seq>:<pid>" so
+    # ZRANGE yields (score desc, join order) just like the in-memory Leaderboard.
+
+    async def add_participant(self, mid: str, pid: str, participant: dict):
+        seq = await self.r.incr(self._key(mid, "seq"))
+        info = {k: v for k, v in participant.items() if k != "score"}
+        info["member"] = f"{seq:010d}:{pid}"
+        pipe = self.r.pipeline()
+        pipe.hset(self._key(mid, "p"), pid, json.dumps(info))
+        pipe.zadd(self._key(mid, "lb"), {info["member"]: -participant.get("score", 0)})
+        pipe.sadd(self._key(mid, "rot"), pid)
+        if participant.get("token"):
+            pipe.hset(self._key(mid, "tok"), participant["token"], pid)
+        await pipe.execute()
+
+    async def _member(self, mid: str, pid: str) -> Optional[str]:
+        raw = await self.r.hget(self._key(mid, "p"), pid)
+        return json.loads(raw)["member"] if raw is not None else None
+
+    async def remove_participant(self, mid: str, pid: str) -> bool:
+        p = await self.get_participant(mid, pid)
+        if p is None:
+            return False
+        pipe = self.r.pipeline()
+        pipe.hdel(self._key(mid, "p"), pid)
+        pipe.zrem(self._key(mid, "lb"), p["member"])
+        pipe.srem(self._key(mid, "rot"), pid)
+        pipe.srem(self._key(mid, "away"), pid)
+        if p.get("token"):
+            gone = {"name": p["name"], "is_moderator": p.get("is_moderator", False), "score": p["score"], "token": p["token"]}
+            pipe.hset(self._key(mid, "gone"), pid, json.dumps(gone))
+        removed = (await pipe.execute())[0]
+        return bool(removed)
+
+    async def resume_participant(self, mid: str, token: str, sid: str) -> Optional[Tuple[str, bool]]:
+        pid = await self.r.hget(self._key(mid, "tok"), token)
+        if pid is None:
+            return None
+        pid = _text(pid)
+        raw = await self.r.hget(self._key(mid, "p"), pid)
+        if raw is not None:
+            info = json.loads(raw)
+            info["sid"] = sid
+            await self.r.hset(self._key(mid, "p"), pid, json.dumps(info))
+            return pid, True
+        pipe = self.r.pipeline(transaction=True)
+        pipe.hget(self._key(mid, "gone"), pid)
+        pipe.hdel(self._key(mid, "gone"), pid)
+        gone, claimed = await pipe.execute()
+        if not claimed:
+            return None  # never left, or another worker resumed it first
+        await self.add_participant(mid, pid, dict(json.loads(gone), sid=sid))
+        return pid, False
+
+    async def get_participant(self, mid: str, pid: str) -> Optional[dict]:
+        raw = await self.r.hget(self._key(mid, "p"), pid)
+        if raw is None:
+            return None
+        p = json.loads(raw)
+        p["score"] = -int(await self.r.zscore(self._key(mid, "lb"), p["member"]) or 0)
+        return p
+
+    async def get_participants(self, mid: str) -> Dict[str, dict]:
+        pipe = self.r.pipeline()
+        pipe.hgetall(self._key(mid, "p"))
+        pipe.zrange(self._key(mid, "lb"), 0, -1, withscores=True)
+        raw, ranked = await pipe.execute()
+        scores = {_text(member): -int(score) for member, score in ranked}
+        out = {}
+        for pid, info in raw.items():
+            p = json.loads(info)
+            p["score"] = scores.get(p["member"], 0)
+            out[_text(pid)] = p
+        return out
+
+    async def next_answerer(self, mid: str) -> Optional[str]:
+        # "rot" holds who has not had a turn this pass; SPOP picks one at random and
+        # atomically, so workers never hand out the same turn. Refilled once per pass
+        # with everyone not in "away" (disconnected, within their grace period).
+        key = self._key(mid, "rot")
+        pid = await self.r.spop(key)
+        if pid is None:
+            pipe = self.r.pipeline()
+            pipe.hkeys(self._key(mid, "p"))
+            pipe.smembers(self._key(mid, "away"))
+            pids, away = await pipe.execute()
+            pids = set(pids) - set(away)
+            if not pids:
+                return None
+            await self.r.sadd(key, *pids)
+            pid = await self.r.spop(key)
+        return _text(pid) if pid is not None else None
+
+    async def set_available(self, mid: str, pid: str, available: bool):
+        pipe = self.r.pipeline(transaction=True)
+        if available:
+            pipe.srem(self._key(mid, "away"), pid)
+            pipe.sadd(self._key(mid, "rot"), pid)
+        else:
+            pipe.sadd(self._key(mid, "away"), pid)
+            pipe.srem(self._key(mid, "rot"), pid)
+        await pipe.execute()
+
+    async def add_score(self, mid: str, pid: str, points: int) -> Optional[Tuple[int, int, int]]:
+        member = await self._member(mid, pid)
+        if member is None:
+            return None
+        key = self._key(mid, "lb")
+        pipe = self.r.pipeline(transaction=True)
+        pipe.zrank(key, member)
+        pipe.zincrby(key, -points, member)
+        pipe.zrank(key, member)
+        old_rank, score, new_rank = await pipe.execute()
+        return -int(score), old_rank + 1, new_rank + 1
+
+    async def add_scores(self, mid: str, awards: Dict[str, int]):
+        pids = list(awards)
+        infos = await self.r.hmget(self._key(mid, "p"), pids) if pids else []
+        pipe = self.r.pipeline()
+        for pid, info in zip(pids, infos):
+            if info is not None:
+                pipe.zincrby(self._key(mid, "lb"), -awards[pid], json.loads(info)["member"])
+        await pipe.execute()
+
+    async def top(self, mid: str, k: int = LEADERBOARD_TOP) -> List[dict]:
+        ranked = await self.r.zrange(self._key(mid, "lb"), 0, k - 1, withscores=True)
+        if not ranked:
+            return []
+        pids = [_text(member).split(":", 1)[1] for member, _ in ranked]
+        infos = await self.r.hmget(self._key(mid, "p"), pids)
+        return [{"id": pid, "name": json.loads(info)["name"] if info else "", "score": -int(score), "rank": i + 1}
+                for i, (pid, info, (_, score)) in enumerate(zip(pids, infos, ranked))]
+
+    async def next_presence_seq(self, mid: str) -> int:
+        return int(await self.r.incr(self._key(mid, "pseq")))
+
+    async def presence_seq(self, mid: str) -> int:
+        return int(await self.r.get(self._key(mid, "pseq")) or 0)
+
+    # The event ring is a capped list; its last entry is always event number "eseq",
+    # so one MULTI gives both and the seq of every entry follows from its position.
+
+    async def push_event(self, mid: str, event: str, data) -> int:
+        key = self._key(mid, "events")
+        pipe = self.r.pipeline(transaction=True)
+        pipe.incr(self._key(mid, "eseq"))
+        pipe.rpush(key, json.dumps([event, data]))
+        pipe.ltrim(key, -RING_SIZE, -1)
+        seq, _, _ = await pipe.execute()
+        return int(seq)
+
+    async def events_since(self, mid: str, seq: Optional[int]) -> Tuple[int, Optional[list]]:
+        pipe = self.r.pipeline(transaction=True)
+        pipe.get(self._key(mid, "eseq"))
+        pipe.lrange(self._key(mid, "events"), 0, -1)
+        latest, raw = await pipe.execute()
+        latest = int(latest or 0)
+        first = latest - len(raw) + 1
+        if seq is None or seq > latest or seq + 1 < first:
+            return latest, None
+        missed = []
+        for i, entry in enumerate(raw[seq + 1 - first:], seq + 1):
+            event, data = json.loads(entry)
+            if isinstance(data, dict):
+                data["event_seq"] = i
+            missed.append((event, data))
+        return latest, missed
+
+    async def set_round(self, mid: str, rnd: dict):
+        await self.r.set(self._key(mid, "round"), json.dumps(rnd), ex=self.ROUND_TTL)
+
+    async def get_round(self, mid: str) -> Optional[dict]:
+        raw = await self.r.get(self._key(mid, "round"))
+        if raw is None:
+            return None
+        rnd = json.loads(raw)
+        result = await self.r.hgetall(self._key(mid, f"closed:{rnd['round_id']}"))
+        if result:
+            rnd["answered"] = True
+            rnd.update({_text(k): json.loads(v) for k, v in result.items()})
+        return rnd
+
+    # "everyone answers" rounds: HSETNX per participant keeps the first answer,
+    # whichever worker it reached
+
+    async def record_answer(self, mid: str, round_id: str, pid: str, choice: int, elapsed: float) -> bool:
+        key = self._key(mid, f"answers:{round_id}")
+        pipe = self.r.pipeline()
+        pipe.hsetnx(key, pid, f"{choice}:{elapsed}")
+        pipe.expire(key, self.ROUND_TTL)
+        added, _ = await pipe.execute()
+        return bool(added)
+
+    async def take_answers(self, mid: str, round_id: str) -> AnswerBuffer:
+        key = self._key(mid, f"answers:{round_id}")
+        pipe = self.r.pipeline(transaction=True)
+        pipe.hgetall(key)
+        pipe.delete(key)
+        raw, _ = await pipe.execute()
+        buffer = AnswerBuffer()
+        for pid, value in raw.items():
+            choice, elapsed = _text(value).split(":")
+            buffer.add(_text(pid), int(choice), float(elapsed))
+        return buffer
+
+    async def close_round(self, mid: str, round_id: str, **result) -> bool:
+        # HSETNX on the round's close record is the cross-worker arbiter between answer and timeout
+        # a stale round id (a late timeout from the previous round) never closes the current one
+        raw = await self.r.get(self._key(mid, "round"))
+        if raw is None or json.loads(raw).get("round_id") != round_id:
+            return False
+        key = self._key(mid, f"closed:{round_id}")
+        if not await self.r.hsetnx(key, "answered", "true"):
+            return False
+        if result:
+            await self.r.hset(key, mapping={k: json.dumps(v) for k, v in result.items()})
+        await self.r.expire(key, self.ROUND_TTL)
+        return True
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def make_store():
+    """Pick the backend from QUIZ_REDIS_URL; in-memory when unset, journaled to disk if QUIZ_JOURNAL_DIR is set."""
+    url = os.environ.get("QUIZ_REDIS_URL")
+    if not url:
+        journal = open_journal()
+        return JournaledStore(journal) if journal else MemoryStore()
+    import redis.asyncio as redis
+    return RedisStore(redis.from_url(url))
+
+
+def make_client_manager():
+    """Socket.IO pub/sub manager so room emits reach clients held by other workers."""
+    url = os.environ.get("QUIZ_REDIS_URL")
+    if not url:
+        return None
+    import socketio
+    return socketio.AsyncRedisManager(url)
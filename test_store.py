@@ -0,0 +1,77 @@
+"""MemoryStore and RedisStore (against fakeredis) must give the same answers.
+
+    pip install -r requirements-test.txt && python -m pytest -q
+"""
+import asyncio
+
+import pytest
+
+from store import MemoryStore, RedisStore
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def stores():
+    return [MemoryStore(), RedisStore(fakeredis.aioredis.FakeRedis())]
+
+
+def participant(p: dict) -> dict:
+    # RedisStore also keeps its sorted-set member in the record
+    return {k: p[k] for k in ("name", "sid", "score", "is_moderator")}
+
+
+async def scenario(store) -> list:
+    out = []
+    await store.ensure_meeting("m")
+    for i, name in enumerate(["mod", "a", "b", "c"]):
+        await store.add_participant("m", f"p{i}", {"name": name, "sid": f"s{i}", "score": 0,
+                                                   "is_moderator": i == 0, "token": f"t{i}"})
+    out.append(await store.participant_count("m"))
+    out.append(await store.add_score("m", "p2", 5))
+    out.append(await store.add_score("m", "p3", 3))
+    out.append(await store.add_score("m", "p2", 1))
+    out.append(await store.add_score("m", "nobody", 1))
+    await store.add_scores("m", {"p1": 3, "p3": 4})
+    out.append(await store.top("m", 3))
+
+    # resume inside the grace period: same seat, new sid
+    out.append(await store.resume_participant("m", "t1", "s1b"))
+    out.append(participant(await store.get_participant("m", "p1")))
+    # leave, then resume: back with the score it left with
+    out.append(await store.remove_participant("m", "p3"))
+    out.append(await store.remove_participant("m", "p3"))
+    out.append(await store.top("m"))
+    out.append(await store.resume_participant("m", "t3", "s3b"))
+    out.append(await store.resume_participant("m", "t3", "s3c"))
+    out.append(await store.resume_participant("m", "unknown", "s"))
+    out.append({pid: participant(p) for pid, p in sorted((await store.get_participants("m")).items())})
+    out.append(await store.top("m"))
+
+    # only the first close of a round wins
+    await store.set_round("m", {"round_id": "r1", "answered": False})
+    out.append(await store.close_round("m", "r2"))
+    out.append(await store.close_round("m", "r1", correct=True))
+    out.append(await store.close_round("m", "r1"))
+    out.append((await store.get_round("m"))["answered"])
+    return out
+
+
+def test_memory_and_redis_agree():
+    memory, redis = stores()
+    assert asyncio.run(scenario(memory)) == asyncio.run(scenario(redis))
+
+
+async def answers(store) -> list:
+    await store.ensure_meeting("m")
+    out = [await store.record_answer("m", "r1", "p1", 2, 1.5),
+           await store.record_answer("m", "r1", "p1", 0, 2.0),
+           await store.record_answer("m", "r1", "p2", 1, 3.0)]
+    buffer = await store.take_answers("m", "r1")
+    out.append(sorted(zip(buffer.keys, buffer.choices, buffer.times)))
+    out.append(len(await store.take_answers("m", "r1")))
+    return out
+
+
+def test_answer_buffers_agree():
+    memory, redis = stores()
+    assert asyncio.run(answers(memory)) == asyncio.run(answers(redis))
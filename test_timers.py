@@ -0,0 +1,29 @@
+import asyncio
+
+from timers import Scheduler
+
+
+def test_timer_added_while_compacting_fires_on_time():
+    # a callback cancels enough far timers to compact the heap, then schedules a near one
+    async def run():
+        scheduler = Scheduler()
+        loop = asyncio.get_running_loop()
+        fired = asyncio.Event()
+        far = [scheduler.call_later(2.0, lambda: None) for _ in range(100)]
+        later = scheduler.call_later(2.0, lambda: None)  # stays live: the next deadline after the near one
+
+        def cleanup():
+            for timer in far:
+                scheduler.cancel(timer)
+            scheduler.call_later(0.05, fired.set)
+
+        start = loop.time()
+        scheduler.call_later(0, cleanup)
+        await asyncio.wait_for(fired.wait(), 1.0)
+        elapsed, pending = loop.time() - start, scheduler.pending
+        scheduler.cancel(later)
+        return elapsed, pending
+
+    elapsed, pending = asyncio.run(run())
+    assert elapsed < 0.5
+    assert pending == 1
@@ -0,0 +1,107 @@
+import asyncio
+import heapq
+import itertools
+from typing import Callable, Optional
+
+
+class Timer:
+    __slots__ = ("when", "seq", "callback", "args", "cancelled")
+
+    def __init__(self, when: float, seq: int, callback: Callable, args: tuple):
+        self.when = when
+        self.seq = seq
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def __lt__(self, other: "Timer") -> bool:
+        return (self.when, self.seq) < (other.when, other.seq)
+
+
+class Scheduler:
+    """One heap of deadlines per process, driven by a single loop.call_at handle.
+
+    Replaces a sleeping task per round/delay: scheduling and cancelling are
+    O(log n), and only the earliest deadline is registered with the event loop.
+    Coroutine callbacks are started as tasks when they fire.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._armed_at: Optional[float] = None
+        self._live = 0
+
+    @property
+    def pending(self) -> int:
+        return self._live
+
+    def call_later(self, delay: float, callback: Callable, *args) -> Timer:
+        loop = asyncio.get_running_loop()
+        timer = Timer(loop.time() + delay, next(self._seq), callback, args)
+        heapq.heappush(self._heap, timer)
+        self._live += 1
+        if self._armed_at is None or timer.when < self._armed_at:
+            self._arm(loop, timer.when)
+        return timer
+
+    def cancel(self, timer: Optional[Timer]):
+        if timer is None or timer.cancelled:
+            return
+        timer.cancelled = True
+        self._live -= 1
+        # cancelled entries are dropped lazily; compact once they dominate the heap
+        if len(self._heap) > 64 and self._live < len(self._heap) // 2:
+            self._heap = [t for t in self._heap if not t.cancelled]
+            heapq.heapify(self._heap)
+
+    def _arm(self, loop: asyncio.AbstractEventLoop, when: float):
+        if self._handle is not None:
+            self._handle.cancel()
+        self._armed_at = when
+        self._handle = loop.call_at(when, self._run)
+
+    def _run(self):
+        loop = asyncio.get_running_loop()
+        self._handle = self._armed_at = None
+        now = loop.time()
+        # self._heap is re-read on every pass: a callback's cancel() may compact it into a new list
+        while self._heap and (self._heap[0].cancelled or self._heap[0].when <= now):
+            timer = heapq.heappop(self._heap)
+            if timer.cancelled:
+                continue
+            timer.cancelled = True  # fired; a late cancel() is a no-op
+            self._live -= 1
+            try:
+                result = timer.callback(*timer.args)
+            except Exception as exc:
+                loop.call_exception_handler({"message": "timer callback failed", "exception": exc})
+                continue
+            if asyncio.iscoroutine(result):
+                spawn(result)
+        if self._heap:
+            self._arm(loop, self._heap[0].when)
+
+
+# Fire-and-forget tasks are kept referenced until done (the loop itself only holds
+# weak references, so an unreferenced task can be collected mid-flight) and their
+# failures are reported when they happen instead of at garbage collection.
+_background = set()
+
+
+def spawn(coro) -> asyncio.Task:
+    task = asyncio.get_running_loop().create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_finished)
+    return task
+
+
+def _finished(task: asyncio.Task):
+    _background.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        task.get_loop().call_exception_handler(
+            {"message": "background task failed", "exception": task.exception(), "task": task})
+
+
+scheduler = Scheduler()
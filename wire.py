@@ -0,0 +1,117 @@
+import json
+from typing import Union
+
+try:
+    import orjson
+except ImportError:  # optional: faster encoder for every wire format
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional: binary frames
+    msgpack = None
+
+Frame = Union[str, bytes]
+
+# --- Wire encodings ---
+# "json": the original full-key JSON text frames (default)
+# "compact": short-key JSON text frames
+# "msgpack": short-key msgpack binary frames, when msgpack is installed
+
+JSON = "json"
+COMPACT = "compact"
+MSGPACK = "msgpack"
+
+SHORT_KEYS = {
+    "type": "t", "question": "q", "answers": "a", "answerer": "w",
+    "question_number": "n", "total_questions": "N", "message": "m",
+    "user": "u", "points": "p", "leaderboard": "l", "changes": "c", "top": "T",
+    "id": "i", "name": "k", "score": "s", "rank": "r", "from": "f", "to": "o",
+    "seq": "S", "participants": "P", "added": "+", "removed": "-", "count": "C",
+    "event_seq": "E", "token": "K",
+}
+
+
+def available() -> tuple:
+    return (JSON, COMPACT, MSGPACK) if msgpack else (JSON, COMPACT)
+
+
+def negotiate(requested: str) -> str:
+    return requested if requested in available() else JSON
+
+
+def shorten(value):
+    if isinstance(value, dict):
+        return {SHORT_KEYS.get(k, k): shorten(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [shorten(v) for v in value]
+    return value
+
+
+def dumps(value) -> str:
+    if orjson is not None:
+        return orjson.dumps(value).decode()
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def encode(message: dict, encoding: str = JSON) -> Frame:
+    if encoding == JSON:
+        return dumps(message)
+    short = shorten(message)
+    if encoding == MSGPACK:
+        return msgpack.packb(short)
+    return dumps(short)
+
+
+class CompiledMessage:
+    """A message whose static fields are encoded once per encoding.
+
+    frame() only encodes the per-send fields and splices them onto the cached
+    static part, so e.g. a question's text and choices are serialized once at
+    load time rather than for every round.
+    """
+
+    def __init__(self, static: dict):
+        self.static = static
+        self._parts = {}
+
+    def _part(self, encoding: str):
+        part = self._parts.get(encoding)
+        if part is None:
+            part = self._parts[encoding] = _pairs(self.static, encoding)
+        return part
+
+    def frame(self, encoding: str = JSON, dynamic: dict = None) -> Frame:
+        static = self._part(encoding)
+        extra = _pairs(dynamic, encoding) if dynamic else None
+        if encoding == MSGPACK:
+            size = len(self.static) + (len(dynamic) if dynamic else 0)
+            return _map_header(size) + static + (extra or b"")
+        body = static + "," + extra if extra else static
+        return "{" + body + "}"
+
+
+def _pairs(fields: dict, encoding: str):
+    if encoding == MSGPACK:
+        return b"".join(msgpack.packb(SHORT_KEYS.get(k, k)) + msgpack.packb(shorten(v)) for k, v in fields.items())
+    if encoding == COMPACT:
+        fields = {SHORT_KEYS.get(k, k): shorten(v) for k, v in fields.items()}
+    return ",".join(dumps(k) + ":" + dumps(v) for k, v in fields.items())
+
+
+def _map_header(size: int) -> bytes:
+    if size < 16:
+        return bytes([0x80 | size])
+    return b"\xde" + size.to_bytes(2, "big")
+
+
+class SocketIOJson:
+    """json-module stand-in for python-socketio's packet encoder, backed by orjson when present."""
+
+    @staticmethod
+    def dumps(value, *args, **kwargs) -> str:
+        return dumps(value)
+
+    @staticmethod
+    def loads(value, *args, **kwargs):
+        return orjson.loads(value) if orjson is not None else json.loads(value)